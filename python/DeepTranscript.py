@@ -1,7 +1,33 @@
 import requests
 import os
 from dotenv import load_dotenv
-load_dotenv() 
+load_dotenv()
+
+DEEPGRAM_API_URL = os.getenv("DEEPGRAM_API_URL", "https://api.deepgram.com/v1/listen")
+
+DEEPGRAM_PARAMS = {
+    "punctuate": "true",
+    "language": "en",
+    "model": "nova-3",
+    "summarize": "v2",
+    "topics": "true",
+    "sentiment": "true",
+    "intents": "true",
+    "entities": "true",
+    "detect_entities": "true",
+    "smart_format": "true"
+}
+
+def parse_deepgram_response(response_json):
+    return {
+        "transcript": response_json.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", ""),
+        "summary": response_json.get("results", {}).get("summary", {}).get("short", ""),
+        "topics": response_json.get("results", {}).get("topics", {}).get("segments", []),
+        "sentiment": response_json.get("results", {}).get("sentiments", {}).get("average", {}),
+        "intents": response_json.get("results", {}).get("intents", []),
+        "entities": response_json.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("entities", [])
+    }
+
 def analyze_audio_with_deepgram(audio_url):
     DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
     headers = {
@@ -9,19 +35,6 @@ def analyze_audio_with_deepgram(audio_url):
         "Content-Type": "application/json"
     }
 
-    params = {
-        "punctuate": "true",
-        "language": "en",
-        "model": "nova-3",
-        "summarize": "v2",
-        "topics": "true",
-        "sentiment": "true",
-        "intents": "true",
-        "entities": "true",
-        "detect_entities": "true",
-        "smart_format": "true"
-    }
-
     payload = {
         "url": audio_url
     }
@@ -29,18 +42,10 @@ def analyze_audio_with_deepgram(audio_url):
     print(f"🔍 Sending this AUDIO_URL to Deepgram: {audio_url}")
     print("📦 Payload:", payload)
 
-    response = requests.post("https://api.deepgram.com/v1/listen", headers=headers, params=params, json=payload)
+    response = requests.post(DEEPGRAM_API_URL, headers=headers, params=DEEPGRAM_PARAMS, json=payload)
 
     if response.ok:
-        response_json = response.json()
-        results = {
-            "transcript": response_json.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", ""),
-            "summary": response_json.get("results", {}).get("summary", {}).get("short", ""),
-            "topics": response_json.get("results", {}).get("topics", {}).get("segments", []),
-            "sentiment": response_json.get("results", {}).get("sentiments", {}).get("average", {}),
-            "intents": response_json.get("results", {}).get("intents", []),
-            "entities": response_json.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("entities", [])
-        }
+        results = parse_deepgram_response(response.json())
         print("REsults",results)
         return results
     else:
@@ -1,73 +1,243 @@
+import os
+import sys
+import json
+import argparse
+import threading
 import nltk
-import whisper
 from transformers import pipeline
 from bertopic import BERTopic
-from presidio_analyzer import AnalyzerEngine
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine
 from pydub import AudioSegment
 
+# Share the Whisper model registry with the main service
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import get_model, get_whisper_model
+from local_summarizer import get_local_summarizer
+
 nltk.download('punkt')
 
+SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "32"))
+BERTOPIC_MODEL_PATH = os.getenv("BERTOPIC_MODEL_PATH", os.path.join("cache", "bertopic_calls"))
+BERTOPIC_CLUSTERS = int(os.getenv("BERTOPIC_CLUSTERS", "30"))
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg')
+
 
 # ---------- 1. AUDIO TO TEXT (Whisper) ----------
 def transcribe_audio_whisper(audio_path):
-    model = whisper.load_model("base")  # Use "small", "medium", "large" for better accuracy
+    model = get_whisper_model("base")  # Use "small", "medium", "large" for better accuracy
     result = model.transcribe(audio_path)
     return result["text"]
 
 
 # ---------- 2. SUMMARIZATION (HuggingFace Falcon/BART) ----------
 def summarize_text(text):
-    summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-    summary = summarizer(text, max_length=100, min_length=30, do_sample=False)
-    return summary[0]['summary_text']
+    # Shared BART summarizer, loaded once; long transcripts are summarized map-reduce style
+    return get_local_summarizer().summarize([text])[0]
 
 
 # ---------- 3. SENTIMENT ANALYSIS (CardiffNLP) ----------
+def get_sentiment_pipeline():
+    return get_model(f"sentiment:{SENTIMENT_MODEL}",
+                     lambda: pipeline("sentiment-analysis", model=SENTIMENT_MODEL))
+
+
+def analyze_sentiment_batch(texts, batch_size=NLP_BATCH_SIZE):
+    """One {"label", "score"} per text; long texts are truncated to the model's limit."""
+    return list(get_sentiment_pipeline()(list(texts), batch_size=batch_size, truncation=True))
+
+
 def analyze_sentiment(text):
-    sentiment_analyzer = pipeline("sentiment-analysis", model="cardiffnlp/twitter-roberta-base-sentiment")
-    return sentiment_analyzer(text)[0]
+    return analyze_sentiment_batch([text])[0]
 
 
 # ---------- 4. TOPIC MODELING (BERTopic) ----------
-def topic_modeling(text):
-    topic_model = BERTopic()
-    topics, _ = topic_model.fit_transform([text])
-    return topic_model.get_topic_info().head()
+def _new_topic_model():
+    # Online components so new calls can be folded in with partial_fit
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.decomposition import IncrementalPCA
+    from bertopic.vectorizers import OnlineCountVectorizer
+    return BERTopic(
+        umap_model=IncrementalPCA(n_components=5),
+        hdbscan_model=MiniBatchKMeans(n_clusters=BERTOPIC_CLUSTERS, random_state=0),
+        vectorizer_model=OnlineCountVectorizer(stop_words="english", decay=.01)
+    )
+
+
+class CallTopics:
+    """BERTopic model over the whole call corpus, updated incrementally.
+
+    The model is fit on batches of the corpus with `partial_fit`, saved to
+    `path`, and reloaded on the next start; later calls are folded in with
+    `update` and assigned topics with `transform`. Batches smaller than the
+    number of clusters are only transformed, not fitted.
+    """
+
+    def __init__(self, path=BERTOPIC_MODEL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._model = None
+        self._fitted = False
+
+    @property
+    def model(self):
+        if self._model is None:
+            if os.path.exists(self.path):
+                self._model = BERTopic.load(self.path)
+                self._fitted = True
+            else:
+                self._model = _new_topic_model()
+        return self._model
+
+    def _partial_fit(self, texts):
+        # Each partial_fit batch must hold at least as many documents as clusters
+        for i in range(0, len(texts), max(BERTOPIC_CLUSTERS, 1000)):
+            batch = texts[i:i + max(BERTOPIC_CLUSTERS, 1000)]
+            if len(batch) >= BERTOPIC_CLUSTERS:
+                self.model.partial_fit(batch)
+                self._fitted = True
+
+    def fit(self, texts):
+        with self._lock:
+            self._model = _new_topic_model()
+            self._fitted = False
+            self._partial_fit(list(texts))
+            self.save()
+
+    def update(self, texts):
+        with self._lock:
+            self._partial_fit(list(texts))
+            self.save()
+
+    def transform(self, texts):
+        with self._lock:
+            model = self.model
+            if not self._fitted:
+                return [None] * len(texts)
+            topics, _ = model.transform(list(texts))
+        return [int(topic) for topic in topics]
+
+    def topic_info(self):
+        with self._lock:
+            model = self.model
+            return model.get_topic_info() if self._fitted else None
+
+    def save(self):
+        if self._fitted:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.model.save(self.path, serialization="pickle")
+
+
+call_topics = CallTopics()
 
 
-# ---------- 5. PII DETECTION (Presidio) ----------
-def detect_pii(text):
-    analyzer = AnalyzerEngine()
-    results = analyzer.analyze(text=text, language='en')
-    pii_items = [{"entity_type": r.entity_type, "start": r.start, "end": r.end} for r in results]
-    return pii_items
+def topic_modeling(text):
+    """Topic id of `text` under the corpus model, None until it has been fit."""
+    return call_topics.transform([text])[0]
 
 
-# ---------- MAIN ----------
-if __name__ == "__main__":
-    audio_file = "C:/Users/madhu/OneDrive/Desktop/AudioFile/Backend/Applycreditcard-negative.wav"
+# ---------- 5. PII DETECTION (Presidio) ----------
+def get_batch_analyzer():
+    return get_model("presidio:analyzer", lambda: BatchAnalyzerEngine(analyzer_engine=AnalyzerEngine()))
 
-    # Convert audio to a compatible format for Whisper
-    print("Converting audio...")
-    audio = AudioSegment.from_file(audio_file)
-    audio.export("converted.wav", format="wav")
 
-    print("\nTranscribing with Whisper...")
-    transcript = transcribe_audio_whisper("converted.wav")
-    print("\nTranscript:\n", transcript)
+def detect_pii_batch(texts, batch_size=NLP_BATCH_SIZE):
+    results = get_batch_analyzer().analyze_iterator(list(texts), language='en', batch_size=batch_size)
+    return [[{"entity_type": r.entity_type, "start": r.start, "end": r.end} for r in text_results]
+            for text_results in results]
 
-    print("\nSummarizing...")
-    summary = summarize_text(transcript)
-    print("\nSummary:\n", summary)
 
-    print("\nAnalyzing sentiment...")
-    sentiment = analyze_sentiment(transcript)
-    print("\nSentiment:\n", sentiment)
+def detect_pii(text):
+    return detect_pii_batch([text])[0]
+
+
+# ---------- BATCH PIPELINE ----------
+def process_calls(transcripts, names=None, update_topics=True):
+    """Summaries, sentiment, PII and topics for many transcripts at once."""
+    names = names or [f"Document {k+1}" for k in range(len(transcripts))]
+    summaries = get_local_summarizer().summarize(transcripts)
+    sentiments = analyze_sentiment_batch(transcripts)
+    pii = detect_pii_batch(transcripts)
+    if update_topics:
+        call_topics.update(transcripts)
+    topics = call_topics.transform(transcripts)
+    return [
+        {"fileName": name, "transcript": transcript, "summary": summary,
+         "sentiment": sentiment, "pii": pii_items, "topic": topic}
+        for name, transcript, summary, sentiment, pii_items, topic
+        in zip(names, transcripts, summaries, sentiments, pii, topics)
+    ]
+
+
+def _read_inputs(paths):
+    """(name, transcript) pairs from audio files, directories of them, or JSONL transcripts."""
+    items = []
+    for path in paths:
+        if os.path.isdir(path):
+            items.extend(_read_inputs(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                             if name.lower().endswith(AUDIO_EXTENSIONS + ('.jsonl',)))))
+        elif path.lower().endswith('.jsonl'):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        items.append((record.get("fileName", f"Document {len(items)+1}"), record["transcription"]))
+        else:
+            print(f"Transcribing {path}...")
+            items.append((os.path.basename(path), transcribe_audio_whisper(path)))
+    return items
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Open-source call analytics pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="Analyze many calls and write one JSON line per call")
+    batch.add_argument("inputs", nargs="+", help="Audio files, directories, or JSONL files with "
+                                                 "{\"fileName\", \"transcription\"} records")
+    batch.add_argument("--output", default="call_analysis.jsonl")
+    batch.add_argument("--batch-size", type=int, default=256, help="Transcripts processed per step")
+    batch.add_argument("--no-topic-update", action="store_true", help="Assign topics without updating the model")
+
+    fit = subparsers.add_parser("fit-topics", help="Fit the BERTopic model on a full transcript corpus")
+    fit.add_argument("inputs", nargs="+")
+
+    single = subparsers.add_parser("file", help="Analyze one audio file and print the results")
+    single.add_argument("audio_file")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "fit-topics":
+        items = _read_inputs(args.inputs)
+        call_topics.fit([transcript for _, transcript in items])
+        print(call_topics.topic_info())
+    elif args.command == "batch":
+        items = _read_inputs(args.inputs)
+        with open(args.output, 'w', encoding='utf-8') as out:
+            for i in range(0, len(items), args.batch_size):
+                chunk = items[i:i + args.batch_size]
+                results = process_calls([t for _, t in chunk], [n for n, _ in chunk],
+                                        update_topics=not args.no_topic_update)
+                for result in results:
+                    out.write(json.dumps(result, ensure_ascii=False, default=float) + "\n")
+                print(f"Processed {i + len(chunk)}/{len(items)} calls")
+    else:
+        # Convert audio to a compatible format for Whisper
+        print("Converting audio...")
+        audio = AudioSegment.from_file(args.audio_file)
+        audio.export("converted.wav", format="wav")
+
+        print("\nTranscribing with Whisper...")
+        transcript = transcribe_audio_whisper("converted.wav")
+        print("\nTranscript:\n", transcript)
+
+        result = process_calls([transcript], [os.path.basename(args.audio_file)], update_topics=False)[0]
+        print("\nSummary:\n", result["summary"])
+        print("\nSentiment:\n", result["sentiment"])
+        print("\nPII Entities:\n", result["pii"])
+        print("\nTopic:\n", result["topic"])
 
-    print("\nDetecting PII...")
-    pii = detect_pii(transcript)
-    print("\nPII Entities:\n", pii)
 
-    print("\nTopic Modeling...")
-    topics = topic_modeling(transcript)
-    print("\nTopics:\n", topics)
+# ---------- MAIN ----------
+if __name__ == "__main__":
+    main()
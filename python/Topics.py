@@ -4,37 +4,150 @@ import json
 import re
 import sys
 import io
+import hashlib
+import threading
 from openai import AzureOpenAI
+from llm_memo import get_memo_store
 from dotenv import load_dotenv
 load_dotenv()  
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    azure_endpoint='https://calcenteropenai.openai.azure.com/',
-    api_key=os.getenv('API_KEY'),
-    api_version="2024-05-01-preview"
-)
-# Create the assistant with clearer instructions for JSON output
-assistant = client.beta.assistants.create(
-    model="gpt-4o",
-    instructions = (
+ASSISTANT_MODEL = "gpt-4o"
+ASSISTANT_INSTRUCTIONS = (
     "You are an expert in topic modeling and text analysis. Analyze the following texts, one by one, and identify the main topics for each. "
     "For each text, provide a single topic with a brief description. "
     "Respond in JSON format like this: [{\"topic\": \"Topic Name\", \"description\": \"Brief description of the topic\"}]. "
     "Ensure that each document's topic is clearly identified and properly formatted as valid JSON."
     "You are an expert in multilingual topic modeling. Analyze the given text in its original language and extract the most relevant topics. Maintain the language of the input text. Provide 1-3 concise topics per text, separated by commas."
-),
-    temperature=1,
-    top_p=1
 )
+# Maps the assistant configuration hash to the remote assistant id, so restarts reuse it
+ASSISTANT_STATE_PATH = os.getenv("TOPIC_ASSISTANT_STATE", os.path.join("cache", "topic_assistant.json"))
+
+_client = None
+_assistant_id = None
+_init_lock = threading.Lock()
+
+
+def assistant_config_hash():
+    config = json.dumps({"model": ASSISTANT_MODEL, "instructions": ASSISTANT_INSTRUCTIONS,
+                         "temperature": 1, "top_p": 1}, sort_keys=True)
+    return hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]
+
+
+def _load_assistant_state():
+    try:
+        with open(ASSISTANT_STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_assistant_state(state):
+    os.makedirs(os.path.dirname(ASSISTANT_STATE_PATH) or ".", exist_ok=True)
+    tmp_path = f"{ASSISTANT_STATE_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, ASSISTANT_STATE_PATH)
+
+
+def get_client():
+    global _client
+    with _init_lock:
+        if _client is None:
+            _client = AzureOpenAI(
+                azure_endpoint='https://calcenteropenai.openai.azure.com/',
+                api_key=os.getenv('API_KEY'),
+                api_version="2024-05-01-preview"
+            )
+        return _client
+
+
+def get_assistant_id():
+    """Id of the topic assistant, created on first use only.
+
+    The id is persisted per configuration hash, so server restarts reuse the
+    same remote assistant and changing the instructions creates a new one.
+    """
+    global _assistant_id
+    client = get_client()
+    with _init_lock:
+        if _assistant_id is not None:
+            return _assistant_id
+        config_hash = assistant_config_hash()
+        state = _load_assistant_state()
+        assistant_id = state.get(config_hash)
+        if assistant_id:
+            try:
+                client.beta.assistants.retrieve(assistant_id)
+            except Exception as e:
+                print(f"⚠️ Stored topic assistant {assistant_id} is unavailable ({e}), creating a new one")
+                assistant_id = None
+        if not assistant_id:
+            assistant = client.beta.assistants.create(
+                model=ASSISTANT_MODEL,
+                name=f"topic-modeling-{config_hash}",
+                instructions=ASSISTANT_INSTRUCTIONS,
+                metadata={"config_hash": config_hash},
+                temperature=1,
+                top_p=1
+            )
+            assistant_id = assistant.id
+            state[config_hash] = assistant_id
+            _save_assistant_state(state)
+        _assistant_id = assistant_id
+        return _assistant_id
+
+
+# "chat" runs batches concurrently via topic_engine; "assistants" is the original thread+run polling path
+TOPIC_BACKEND = os.getenv("TOPIC_BACKEND", "chat")
+
+
+def topic_memo_version():
+    if TOPIC_BACKEND == "assistants":
+        return f"assistants:{assistant_config_hash()}"
+    from topic_engine import TOPIC_PROMPT_VERSION
+    return f"chat:{TOPIC_PROMPT_VERSION}"
+
+
+def _model_topics(transcriptions):
+    """{"topic", "description"} per transcription in order, None where modeling failed."""
+    if TOPIC_BACKEND == "assistants":
+        docs = [{"fileName": str(k), "transcription": text} for k, text in enumerate(transcriptions)]
+        topics = [None] * len(transcriptions)
+        for result in process_topic_modeling_assistants(docs):
+            topics[int(result["fileName"])] = {"topic": result["topic"], "description": result["description"]}
+        return topics
+    from topic_engine import model_topics
+    return model_topics(transcriptions)
+
+
 def process_topic_modeling(text_documents):
+    """Topics per document, served from the memo store for transcripts seen before."""
+    print("📥 Received Text Documents:", text_documents)
+    memo = get_memo_store()
+    version = topic_memo_version()
+    transcriptions = [doc.get('transcription', '') for doc in text_documents]
+    topics = [memo.get("topic", version, text) for text in transcriptions]
+
+    misses = [k for k, topic in enumerate(topics) if topic is None]
+    if misses:
+        fresh = _model_topics([transcriptions[k] for k in misses])
+        for k, topic in zip(misses, fresh):
+            if topic is not None:
+                memo.set("topic", version, transcriptions[k], topic)
+                topics[k] = topic
+
+    return [{"fileName": doc.get("fileName", f"Document {k+1}"), **topic}
+            for k, (doc, topic) in enumerate(zip(text_documents, topics)) if topic is not None]
+
+
+def process_topic_modeling_assistants(text_documents):
     results = []
     batch_size = 3
     max_retries = 3
     max_length = 500  # Prevent long transcriptions from exceeding token limits
-
-    print("📥 Received Text Documents:", text_documents)
+    client = get_client()
+    assistant_id = get_assistant_id()
 
     for i in range(0, len(text_documents), batch_size):
         batch = text_documents[i:i + batch_size]
@@ -57,7 +170,7 @@ def process_topic_modeling(text_documents):
                     content=json.dumps({"textDocuments": [doc.get('transcription', '') for doc in batch]})
                 )
 
-                run = client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant.id)
+                run = client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant_id)
 
                 while run.status in ["queued", "in_progress"]:
                     time.sleep(2)
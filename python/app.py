@@ -1,36 +1,53 @@
 from flask import Flask, jsonify, request, send_from_directory,Response, stream_with_context
 from flask_cors import CORS
 import os
-from extact import generateSummary, text_analytics_client
-import logging
-from predict_only import predict  
+from extact import generateSummary, get_text_analytics_client
+from predict_only import get_emotion_model, get_label_encoder, EMOTION_BACKEND, model_path as emotion_model_path
 from Topics import process_topic_modeling
-import tensorflow as tf
 import numpy as np
-import librosa
-import pandas as pd
-from DeepTranscript import analyze_audio_with_deepgram
+from deepgram_client import analyze_urls, analyze_files, DEEPGRAM_UPLOAD_MODE
 import requests
 from werkzeug.utils import secure_filename
-from audio import process_audio_file
+from audio import pipeline_variant, TRANSCRIPTION_ERROR, TRANSLATION_ERROR
+from transcription_pool import transcribe_completed
+from streaming_transcription import transcribe_streaming, MAX_CHUNK_SECONDS
 import os
 import json
-from db_operations import insert_deepgram_results_to_db
+import tempfile
+import threading
+from write_behind import deepgram_write_queue
+from batch_inference import BatchedPredictor
+from features import extract_mfcc, extract_file_windows, WINDOW_SECONDS, HOP_SECONDS, WINDOWS_VERSION
+from emotion_timeline import timeline_from_windows
+from audio_cache import get_audio_cache, hash_audio_file, file_fingerprint
+from model_registry import registry as model_registry
+from llm_memo import get_memo_store
+from local_summarizer import SUMMARY_BACKEND, generate_local_summary, get_local_summarizer
 from dotenv import load_dotenv
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 cors = CORS(app, resources={r"/predict": {"origins": "http://localhost:3000"}})
-model = tf.keras.models.load_model('emotion_recognition_model.h5')
+# Quantized exports score slightly differently, so the backend is part of the cache key
+model_version = f'{EMOTION_BACKEND}-{file_fingerprint(emotion_model_path)}'
+
+# Models, clients and the audio cache index are created on first use, not at import:
+# spawned transcription workers re-run this module as __mp_main__ and only need audio.py.
+# The shared model handle comes from predict_only; results for re-uploaded recordings
+# are served from the content-addressed cache (get_audio_cache).
+_emotion_batcher = None
+_emotion_batcher_lock = threading.Lock()
+
+
+def get_emotion_batcher():
+    """Coalesces concurrent /predict requests into one forward pass."""
+    global _emotion_batcher
+    with _emotion_batcher_lock:
+        if _emotion_batcher is None:
+            _emotion_batcher = BatchedPredictor(get_emotion_model())
+        return _emotion_batcher
 
-# Load the OneHotEncoder for decoding labels
-enc = pd.read_pickle('label_encoder.pkl')  
-# Define Feature Extraction Function
-def extract_mfcc(filename):
-    y, sr = librosa.load(filename, duration=3, offset=0.5)
-    mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40).T, axis=0)
-    return mfcc
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -45,25 +62,86 @@ def predict():
             os.makedirs('temp')
         filepath = f'temp/{file.filename}'
         file.save(filepath)
+        audio_hash = hash_audio_file(filepath)
+        cached = get_audio_cache().get_json('emotion', audio_hash, f'clip-{model_version}')
+        if cached is not None:
+            return jsonify({'filename': file.filename, **cached})
         # Extract features and make predictions
-        mfcc = extract_mfcc(filepath)
-        mfcc = np.expand_dims(mfcc, axis=0)
-        mfcc = np.expand_dims(mfcc, -1)
-        prediction = model.predict(mfcc)
+        mfcc = get_audio_cache().get_array('mfcc', audio_hash, 'clip')
+        if mfcc is None:
+            mfcc = extract_mfcc(filepath)
+            get_audio_cache().set_array('mfcc', audio_hash, mfcc, 'clip')
+        prediction = get_emotion_batcher().predict(mfcc)
         predicted_label = np.argmax(prediction, axis=1)
-        emotion_dict = enc.categories_[0]
+        emotion_dict = get_label_encoder().categories_[0]
         predicted_emotion = emotion_dict[predicted_label[0]]
         print('predicted emotion:',predicted_emotion)
         print('confidence:',prediction)
-        return jsonify({
-            'filename': file.filename,
-            'emotion': predicted_emotion,
+        result = {
+            'emotion': str(predicted_emotion),
             'confidence': float(np.max(prediction))
-        })
+        }
+        get_audio_cache().set_json('emotion', audio_hash, result, f'clip-{model_version}')
+        return jsonify({'filename': file.filename, **result})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/predict-timeline', methods=['POST'])
+def predict_emotion_timeline():
+    if 'audioFile' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+    file = request.files['audioFile']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    filepath = None
+    try:
+        window_seconds = float(request.form.get('windowSeconds', WINDOW_SECONDS))
+        hop_seconds = float(request.form.get('hopSeconds', HOP_SECONDS))
+        if window_seconds <= 0 or hop_seconds <= 0:
+            return jsonify({'error': 'windowSeconds and hopSeconds must be positive'}), 400
+        if not os.path.exists('temp'):
+            os.makedirs('temp')
+        # Unique per request: whole calls are large and concurrent uploads may share a name
+        with tempfile.NamedTemporaryFile(dir='temp', suffix=os.path.splitext(secure_filename(file.filename))[1],
+                                         delete=False) as tmp:
+            filepath = tmp.name
+            file.save(tmp)
+        audio_hash = hash_audio_file(filepath)
+        windows_variant = f'w{window_seconds}-h{hop_seconds}-v{WINDOWS_VERSION}'
+        timeline = get_audio_cache().get_json('emotion', audio_hash, f'timeline-{windows_variant}-{model_version}')
+        if timeline is None:
+            features = get_audio_cache().get_arrays('mfcc', audio_hash, windows_variant)
+            if features is None:
+                windows, start_times, duration = extract_file_windows(filepath, window_seconds, hop_seconds)
+                features = {'windows': windows, 'start_times': start_times, 'duration': duration}
+                get_audio_cache().set_arrays('mfcc', audio_hash, features, windows_variant)
+            timeline = timeline_from_windows(get_emotion_model(), get_label_encoder().categories_[0],
+                                             features['windows'], features['start_times'],
+                                             float(features['duration']), window_seconds)
+            get_audio_cache().set_json('emotion', audio_hash, timeline, f'timeline-{windows_variant}-{model_version}')
+        return jsonify({'filename': file.filename, **timeline})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if filepath is not None and os.path.exists(filepath):
+            os.remove(filepath)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        'emotion_batcher': get_emotion_batcher().stats(),
+        'audio_cache': get_audio_cache().stats(),
+        'models': model_registry.stats(),
+        'db_write_queue': deepgram_write_queue.stats(),
+        'llm_memo': get_memo_store().stats(),
+        'local_summarizer': get_local_summarizer().stats()
+    })
+
+
 @app.route('/topic-modeling', methods=['POST'])
 def topic_modeling():
     data = request.get_json()
@@ -88,10 +166,12 @@ def api_generate_summary():
     data = request.get_json()
     text_documents = data.get('text_documents', [])
     print("textDocuments for summary:",text_documents)
+    if data.get('backend', SUMMARY_BACKEND) == 'local':
+        return jsonify(generate_local_summary(text_documents))
     # Ensure all documents are in the correct format
     documents = [{'id': str(idx), 'language': 'en', 'text': doc} for idx, doc in enumerate(text_documents)]
-    # Use the globally initialized text_analytics_client
-    result = generateSummary(documents,text_analytics_client)
+    # Use the shared text_analytics_client
+    result = generateSummary(documents,get_text_analytics_client())
     return jsonify(result)
 
 # # deepgram
@@ -103,25 +183,54 @@ uploaded_filename = None
 def upload_audio():
     if not request.files:
         return jsonify({"error": "No audio file provided"}), 400
-    results = []
+    uploads = []
     for key in request.files:
         audio = request.files[key]
         filename = audio.filename
         file_path = os.path.join(UPLOAD_FOLDER, filename)
         audio.save(file_path)
         try:
-            NGROK_API_URL = "http://127.0.0.1:4040/api/tunnels"
-            ngrok_response = requests.get(NGROK_API_URL).json()
-            public_url = ngrok_response["tunnels"][0]["public_url"]
-            audio_url = public_url + f"/audio?filename={filename}"
-            deepgram_results = analyze_audio_with_deepgram(audio_url)
-            results.append({
-                "filename": filename,
-                "results": deepgram_results
-            })
+            audio_hash = hash_audio_file(file_path)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
-        insert_deepgram_results_to_db(deepgram_results, filename)
+        uploads.append((filename, audio_hash, get_audio_cache().get_json('deepgram', audio_hash)))
+
+    # Everything not cached is analyzed concurrently through the shared client
+    pending = [(index, filename, audio_hash) for index, (filename, audio_hash, cached) in enumerate(uploads)
+               if cached is None]
+    analyzed = {}
+    if pending:
+        if DEEPGRAM_UPLOAD_MODE == "direct":
+            deepgram_batch = analyze_files([os.path.join(UPLOAD_FOLDER, filename) for _, filename, _ in pending])
+        else:
+            try:
+                NGROK_API_URL = "http://127.0.0.1:4040/api/tunnels"
+                ngrok_response = requests.get(NGROK_API_URL, timeout=10).json()
+                public_url = ngrok_response["tunnels"][0]["public_url"]
+            except Exception as e:
+                return jsonify({"error": str(e)}), 500
+            deepgram_batch = analyze_urls([public_url + f"/audio?filename={filename}" for _, filename, _ in pending])
+        for (index, _, audio_hash), deepgram_results in zip(pending, deepgram_batch):
+            if not isinstance(deepgram_results, Exception):
+                get_audio_cache().set_json('deepgram', audio_hash, deepgram_results)
+            analyzed[index] = deepgram_results
+
+    results = []
+    errors = []
+    for index, (filename, _, cached) in enumerate(uploads):
+        deepgram_results = cached if cached is not None else analyzed[index]
+        if isinstance(deepgram_results, Exception):
+            errors.append(f"{filename}: {deepgram_results}")
+            continue
+        results.append({
+            "filename": filename,
+            "results": deepgram_results
+        })
+    # Database writes happen on the write-behind thread, so the response never waits on SQL Server
+    for item in results:
+        deepgram_write_queue.submit(item)
+    if errors:
+        return jsonify({"error": "; ".join(errors), "results": results}), 500
     return jsonify({
         "message": "All files uploaded and analyzed successfully",
         "results": results
@@ -144,31 +253,102 @@ def process_audio_stream():
         return jsonify({'error': 'No file uploaded'}), 400
 
     files = request.files.getlist('files')
+    # mode=chunked transcribes each file chunk by chunk and emits `partial` events
+    mode = request.form.get('mode', 'pool')
 
-    def generate():
-        for file in files:
+    def generate_chunked():
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        variant = f"{pipeline_variant()}-chunked{MAX_CHUNK_SECONDS:g}"
+        for index, file in enumerate(files):
             if file.filename == '':
                 continue
+            filename = secure_filename(file.filename)
+            filepath = os.path.join(UPLOAD_FOLDER, f"{index}_{filename}")
             try:
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
+                file.save(filepath)
+                audio_hash = hash_audio_file(filepath)
+                result = get_audio_cache().get_json('whisper', audio_hash, variant)
+                if result is None:
+                    for kind, payload in transcribe_streaming(filepath):
+                        if kind == 'partial':
+                            yield f"event: partial\ndata: {json.dumps({'index': index, 'filename': filename, **payload})}\n\n"
+                        else:
+                            result = payload
+                    if not result.pop('failed'):
+                        get_audio_cache().set_json('whisper', audio_hash, result, variant)
+                yield f"data: {json.dumps({'index': index, 'filename': filename, 'transcription': result['transcription'], 'translation': result['translation']})}\n\n"
+            except Exception as e:
+                yield f"data: {json.dumps({'index': index, 'error': f'Failed to process {file.filename}: {str(e)}'})}\n\n"
+            finally:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
 
-                if not os.path.exists(UPLOAD_FOLDER):
-                    os.makedirs(UPLOAD_FOLDER)
+        yield "event: end\ndata: done\n\n"
 
+    def generate():
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        variant = pipeline_variant()
+        pending = []
+        # Cached files are answered right away; the rest go to the worker pool
+        for index, file in enumerate(files):
+            if file.filename == '':
+                continue
+            try:
+                filename = secure_filename(file.filename)
+                filepath = os.path.join(UPLOAD_FOLDER, f"{index}_{filename}")
                 file.save(filepath)
-                result = process_audio_file(filepath)
+                audio_hash = hash_audio_file(filepath)
+                result = get_audio_cache().get_json('whisper', audio_hash, variant)
+                if result is None:
+                    pending.append((index, filename, filepath, audio_hash))
+                    continue
                 os.remove(filepath)
-
-                yield f"data: {json.dumps({'filename': filename, 'transcription': result['transcription'], 'translation': result['translation']})}\n\n"
+                yield f"data: {json.dumps({'index': index, 'filename': filename, 'transcription': result['transcription'], 'translation': result['translation']})}\n\n"
             except Exception as e:
-                yield f"data: {json.dumps({'error': f'Failed to process {file.filename}: {str(e)}'})}\n\n"
+                yield f"data: {json.dumps({'index': index, 'error': f'Failed to process {file.filename}: {str(e)}'})}\n\n"
+
+        try:
+            jobs = (((index, filename, audio_hash), filepath) for index, filename, filepath, audio_hash in pending)
+            for (index, filename, audio_hash), filepath, result, error in transcribe_completed(jobs):
+                os.remove(filepath)
+                if error is not None:
+                    yield f"data: {json.dumps({'index': index, 'error': f'Failed to process {filename}: {str(error)}'})}\n\n"
+                    continue
+                # Failed runs are not cached so a re-upload retries them
+                if result['transcription'] != TRANSCRIPTION_ERROR and result['translation'] != TRANSLATION_ERROR:
+                    get_audio_cache().set_json('whisper', audio_hash, result, variant)
+                yield f"data: {json.dumps({'index': index, 'filename': filename, 'transcription': result['transcription'], 'translation': result['translation']})}\n\n"
+        finally:
+            # Uploads left behind when the client disconnects mid-stream
+            for _, _, filepath, _ in pending:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
 
         yield "event: end\ndata: done\n\n"
 
+    if mode == 'chunked':
+        return Response(stream_with_context(generate_chunked()), mimetype='text/event-stream')
     return Response(stream_with_context(generate()), mimetype='text/event-stream')
 
 
+def start_serving():
+    """Startup work for the process that serves requests."""
+    # Replay writes spooled while the database was unreachable
+    deepgram_write_queue.start()
+    # Load the emotion model and label encoder before the first request
+    get_emotion_batcher()
+    get_label_encoder()
+
+
+if __name__ not in ('__main__', '__mp_main__'):
+    # Imported by a WSGI server (gunicorn, waitress, ...), which serves from this process
+    start_serving()
+
+
 if __name__ == '__main__':
     print("Starting Flask server...")
-    app.run(host="0.0.0.0", port=5000, debug=True, use_reloader=True, threaded=True)
\ No newline at end of file
+    use_reloader = True
+    # With the reloader the parent only watches files; the child it starts serves requests
+    if not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_serving()
+    app.run(host="0.0.0.0", port=5000, debug=True, use_reloader=use_reloader, threaded=True)
\ No newline at end of file
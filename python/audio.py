@@ -1,35 +1,130 @@
-import whisper
+import os
 import traceback
+import torch
+import whisper
+from whisper.audio import N_FRAMES, N_SAMPLES
+from model_registry import get_whisper_model
+
+# Models are loaded on first use and shared through the registry
+TRANSCRIBE_MODEL = "base"
+TRANSLATE_MODEL = "medium"
+
+# "two_model": base transcribes and medium translates, each decoding the file itself.
+# "single_pass": one model, one mel spectrogram and one encoder pass per 30 s window,
+# with transcription and translation both decoded from the shared encoder output.
+PIPELINE_MODE = os.getenv("WHISPER_PIPELINE_MODE", "two_model")
+SINGLE_PASS_MODEL = os.getenv("WHISPER_SINGLE_PASS_MODEL", "medium")
+TRANSLATION_LANGUAGE = "en"
+SKIP_SAME_LANGUAGE = os.getenv("WHISPER_SKIP_SAME_LANGUAGE", "false").lower() == "true"
+
+TRANSCRIPTION_ERROR = "Error transcribing audio."
+TRANSLATION_ERROR = "Error translating audio."
+
+
+def pipeline_variant(mode=PIPELINE_MODE, skip_same_language=SKIP_SAME_LANGUAGE):
+    """Identifies the models/options behind a result, e.g. for cache keys."""
+    models = SINGLE_PASS_MODEL if mode == "single_pass" else f"{TRANSCRIBE_MODEL}-{TRANSLATE_MODEL}"
+    return f"{mode}-{models}" + ("-skip" if skip_same_language else "")
+
+
+def transcribe_and_translate(file_path, model_name=SINGLE_PASS_MODEL, skip_same_language=SKIP_SAME_LANGUAGE, language=None):
+    """Transcribe and translate from one audio decode, mel and encoder pass.
+
+    The audio is cut into consecutive 30 s windows (no timestamp-based
+    seeking), and the language detected on the first window is used for the
+    whole file unless `language` is given. When that language already is the
+    translation target, the translation decode is skipped and the
+    transcription is returned for both. `file_path` may also be a 16 kHz
+    float32 waveform.
+    """
+    model = get_whisper_model(model_name)
+    fp16 = model.device.type != "cpu"
+    audio = whisper.load_audio(file_path) if isinstance(file_path, str) else file_path
+    # As in whisper.transcribe: pad with 30 s of silence in the waveform, so a short last
+    # window is followed by real log-mel silence rather than zeros, and only seek over content
+    mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+    content_frames = mel.shape[-1] - N_FRAMES
 
-transcribe_model = whisper.load_model("base")
-translate_model = whisper.load_model("medium")
+    transcripts = []
+    translations = []
+    for seek in range(0, max(content_frames, 1), N_FRAMES):
+        segment = whisper.pad_or_trim(mel[:, seek:seek + N_FRAMES], N_FRAMES).to(model.device)
+        segment = segment.half() if fp16 else segment
+        with torch.no_grad():
+            audio_features = model.embed_audio(segment.unsqueeze(0))
+        if language is None:
+            _, probs = model.detect_language(audio_features)
+            language = max(probs[0], key=probs[0].get)
+
+        options = whisper.DecodingOptions(language=language, fp16=fp16, without_timestamps=True)
+        transcribed = whisper.decode(model, audio_features, options)[0]
+        transcripts.append(transcribed.text.strip())
+        if not (skip_same_language and language == TRANSLATION_LANGUAGE):
+            translated = whisper.decode(model, audio_features, options, task="translate")[0]
+            translations.append(translated.text.strip())
+
+    transcription_text = " ".join(t for t in transcripts if t)
+    translation_text = " ".join(t for t in translations if t) if translations else transcription_text
+    return transcription_text, translation_text, language
+
+
+def process_audio_file(file_path, mode=PIPELINE_MODE, skip_same_language=SKIP_SAME_LANGUAGE, language=None):
+    """Transcription and English translation of a file path or 16 kHz waveform.
+
+    `language` skips language detection, e.g. for later chunks of a stream.
+    """
+    if isinstance(file_path, str):
+        print(f"Processing file: {file_path}")
+
+    if mode == "single_pass":
+        try:
+            print("Transcribing and translating (single pass)...")
+            transcription_text, translation_text, language = transcribe_and_translate(
+                file_path, skip_same_language=skip_same_language, language=language)
+            print('Transcription:', transcription_text)
+            print("Translation:", translation_text)
+        except Exception as e:
+            print("Transcription error:", str(e))
+            traceback.print_exc()
+            transcription_text = TRANSCRIPTION_ERROR
+            translation_text = TRANSLATION_ERROR
+            language = None
+        return {
+            "transcription": transcription_text,
+            "translation": translation_text,
+            "language": language
+        }
 
-def process_audio_file(file_path):
-    print(f"Processing file: {file_path}")
-    
     # Transcription
+    detected_language = language
     try:
         print("Transcribing...")
-        transcription_result = transcribe_model.transcribe(file_path)
+        transcription_result = get_whisper_model(TRANSCRIBE_MODEL).transcribe(file_path, language=language)
         transcription_text = transcription_result["text"]
+        detected_language = transcription_result.get("language")
         print('Transcription:', transcription_text)
     except Exception as e:
         print("Transcription error:", str(e))
         traceback.print_exc()
-        transcription_text = "Error transcribing audio."
+        transcription_text = TRANSCRIPTION_ERROR
 
     # Translation
-    try:
-        print("Translating...")
-        translation_result = translate_model.transcribe(file_path, task="translate")
-        translation_text = translation_result["text"]
-        print("Translation:", translation_text)
-    except Exception as e:
-        print("Translation error:", str(e))
-        traceback.print_exc()
-        translation_text = "Error translating audio."
+    if skip_same_language and detected_language == TRANSLATION_LANGUAGE:
+        print("Audio is already in the target language, skipping translation.")
+        translation_text = transcription_text
+    else:
+        try:
+            print("Translating...")
+            translation_result = get_whisper_model(TRANSLATE_MODEL).transcribe(file_path, task="translate", language=language)
+            translation_text = translation_result["text"]
+            print("Translation:", translation_text)
+        except Exception as e:
+            print("Translation error:", str(e))
+            traceback.print_exc()
+            translation_text = TRANSLATION_ERROR
 
     return {
         "transcription": transcription_text,
-        "translation": translation_text
+        "translation": translation_text,
+        "language": detected_language
     }
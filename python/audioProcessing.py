@@ -1,15 +1,14 @@
 import os
-import whisper
-from transformers import pipeline
+from model_registry import get_whisper_model
 def transcribe_audio(audio_path):
     print(f"Transcribing: {audio_path}")
-    model = whisper.load_model("base")
+    model = get_whisper_model("base")
     result = model.transcribe(audio_path)
     return result["text"]
 
 def translate_audio(audio_path):
     print(f"Translating: {audio_path}")
-    model = whisper.load_model("medium")
+    model = get_whisper_model("medium")
     result = model.transcribe(audio_path, task="translate")
     return result["text"]
 def process_audio_file(file_path):
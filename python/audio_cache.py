@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Own directory: everything under it is treated as a cache entry and may be evicted
+CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", os.path.join("cache", "audio"))
+CACHE_MAX_BYTES = int(float(os.getenv("AUDIO_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_audio_file(path):
+    """SHA-256 of the file contents (not the filename)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """Short fingerprint of a model/artifact file so cached results follow retraining."""
+    if not os.path.exists(path):
+        return "missing"
+    st = os.stat(path)
+    return hashlib.sha256(f"{st.st_size}:{st.st_mtime_ns}".encode('utf-8')).hexdigest()[:12]
+
+
+class AudioCache:
+    """On-disk cache of per-recording results keyed by the audio content hash.
+
+    Entries live under `<root>/<kind>/<hash[:2]>/<hash>[-variant].<ext>` where
+    kind is e.g. "mfcc", "emotion", "whisper" or "deepgram" and variant encodes
+    the parameters the result depends on. Total size is bounded by `max_bytes`
+    with least-recently-used eviction; access recency survives restarts through
+    the file mtime.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> size, oldest first
+        self._total_bytes = 0
+        self._hits = {}
+        self._misses = {}
+        self._evictions = 0
+        self._load_index()
+
+    def _load_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                found.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total_bytes += size
+
+    def _path(self, kind, key, variant, ext):
+        name = key if not variant else f"{key}-{re.sub(r'[^A-Za-z0-9_.+-]', '_', str(variant))}"
+        return os.path.join(self.root, kind, key[:2], f"{name}.{ext}")
+
+    def _lookup(self, kind, path):
+        with self._lock:
+            if path not in self._entries or not os.path.exists(path):
+                self._entries.pop(path, None)
+                self._misses[kind] = self._misses.get(kind, 0) + 1
+                return False
+            self._entries.move_to_end(path)
+            self._hits[kind] = self._hits.get(kind, 0) + 1
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return True
+
+    def _store(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total_bytes -= self._entries.pop(path, 0)
+            self._entries[path] = size
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                self._evictions += 1
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    def get_json(self, kind, key, variant=""):
+        path = self._path(kind, key, variant, "json")
+        if not self._lookup(kind, path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set_json(self, kind, key, value, variant=""):
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+        self._store(self._path(kind, key, variant, "json"), write)
+
+    def get_array(self, kind, key, variant=""):
+        path = self._path(kind, key, variant, "npy")
+        if not self._lookup(kind, path):
+            return None
+        try:
+            return np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    def set_array(self, kind, key, value, variant=""):
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(value), allow_pickle=False)
+        self._store(self._path(kind, key, variant, "npy"), write)
+
+    def get_arrays(self, kind, key, variant=""):
+        path = self._path(kind, key, variant, "npz")
+        if not self._lookup(kind, path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+
+    def set_arrays(self, kind, key, arrays, variant=""):
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **{name: np.asarray(value) for name, value in arrays.items()})
+        self._store(self._path(kind, key, variant, "npz"), write)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+                "hits": dict(self._hits),
+                "misses": dict(self._misses),
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_audio_cache():
+    """Process-wide cache instance, created on first use."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = AudioCache()
+    return _default_cache
@@ -0,0 +1,21 @@
+import asyncio
+import threading
+
+# One long-lived event loop per process, so async clients (and their connection
+# pools) can be shared by every Flask request thread.
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-clients", daemon=True).start()
+        return _loop
+
+
+def run(coroutine, timeout=None):
+    """Run `coroutine` on the shared loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop()).result(timeout)
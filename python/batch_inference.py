@@ -0,0 +1,139 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tuning knobs for the request-coalescing worker
+MAX_BATCH_SIZE = int(os.getenv("EMOTION_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("EMOTION_MAX_WAIT_MS", "10"))
+STATS_WINDOW = int(os.getenv("EMOTION_STATS_WINDOW", "1000"))
+
+
+class BatchedPredictor:
+    """Coalesces MFCC vectors from concurrent requests into one model call.
+
+    Callers submit a (40,) vector or an (n, 40) matrix and get back the
+    softmax rows for exactly what they submitted. A single background thread
+    waits up to `max_wait_ms` after the first pending request, or until
+    `max_batch_size` rows are queued, then runs one forward pass.
+    """
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=STATS_WINDOW)
+        self._batch_latencies = deque(maxlen=STATS_WINDOW)
+        self._queue_waits = deque(maxlen=STATS_WINDOW)
+        self._total_batches = 0
+        self._total_rows = 0
+        self._total_errors = 0
+
+    def _ensure_started(self):
+        # Started lazily so the Flask reloader parent never spawns a worker
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="emotion-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, features):
+        rows = np.asarray(features, dtype=np.float32)
+        if rows.ndim == 1:
+            rows = rows[np.newaxis, :]
+        future = Future()
+        self._ensure_started()
+        self._queue.put((rows, future, time.perf_counter()))
+        return future
+
+    def predict(self, features, timeout=None):
+        return self.submit(features).result(timeout=timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        pending = [first]
+        n_rows = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            n_rows += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            started = time.perf_counter()
+            try:
+                batch = np.concatenate([rows for rows, _, _ in pending], axis=0)
+                probs = np.asarray(self.model.predict_on_batch(batch[..., np.newaxis]))
+            except Exception as e:
+                logger.exception("Emotion batch of %d requests failed", len(pending))
+                with self._stats_lock:
+                    self._total_errors += 1
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+            latency = time.perf_counter() - started
+
+            offset = 0
+            for rows, future, _ in pending:
+                future.set_result(probs[offset:offset + len(rows)])
+                offset += len(rows)
+
+            with self._stats_lock:
+                self._total_batches += 1
+                self._total_rows += len(batch)
+                self._batch_sizes.append(len(batch))
+                self._batch_latencies.append(latency)
+                self._queue_waits.extend(started - enqueued for _, _, enqueued in pending)
+            logger.debug("Emotion batch: %d rows from %d requests in %.1f ms",
+                         len(batch), len(pending), latency * 1000)
+
+    def stats(self):
+        with self._stats_lock:
+            sizes = np.array(self._batch_sizes, dtype=np.float64)
+            latencies = np.array(self._batch_latencies, dtype=np.float64) * 1000
+            waits = np.array(self._queue_waits, dtype=np.float64) * 1000
+            totals = {
+                "total_batches": self._total_batches,
+                "total_rows": self._total_rows,
+                "total_errors": self._total_errors,
+            }
+
+        def summary(values):
+            if not len(values):
+                return {"mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+            return {
+                "mean": round(float(values.mean()), 3),
+                "p50": round(float(np.percentile(values, 50)), 3),
+                "p99": round(float(np.percentile(values, 99)), 3),
+                "max": round(float(values.max()), 3),
+            }
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize(),
+            **totals,
+            "batch_size": summary(sizes),
+            "batch_latency_ms": summary(latencies),
+            "queue_wait_ms": summary(waits),
+        }
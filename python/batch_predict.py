@@ -0,0 +1,230 @@
+import os
+import csv
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from features import extract_mfcc, N_MFCC
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.m4a')
+BATCH_WORKERS = int(os.getenv("BATCH_PREDICT_WORKERS", str(os.cpu_count() or 1)))
+# Files per decode task; amortises inter-process overhead
+FILES_PER_TASK = int(os.getenv("BATCH_PREDICT_FILES_PER_TASK", "32"))
+MODEL_BATCH_SIZE = int(os.getenv("BATCH_PREDICT_MODEL_BATCH_SIZE", "1024"))
+# Feature batches decoded ahead of the model
+PREFETCH_BATCHES = int(os.getenv("BATCH_PREDICT_PREFETCH_BATCHES", "4"))
+
+
+def iter_audio_paths(source):
+    """Audio paths from a directory walk or a manifest (one path per line, or a CSV with a `path` column)."""
+    if os.path.isdir(source):
+        for dirname, _, filenames in os.walk(source):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(AUDIO_EXTENSIONS):
+                    yield os.path.join(dirname, filename)
+        return
+    with open(source, 'r', encoding='utf-8', newline='') as f:
+        first = f.readline()
+        if 'path' in [column.strip() for column in first.strip().split(',')]:
+            f.seek(0)
+            for row in csv.DictReader(f):
+                if row.get('path'):
+                    yield row['path']
+        else:
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+
+
+def _decode_task(paths):
+    """Worker: clip MFCCs for `paths`; rows of failed files are NaN with the error kept."""
+    features = np.full((len(paths), N_MFCC), np.nan, dtype=np.float32)
+    errors = [None] * len(paths)
+    for k, path in enumerate(paths):
+        try:
+            features[k] = extract_mfcc(path)
+        except Exception as e:
+            errors[k] = repr(e)
+    return paths, features, errors
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def decode_in_order(paths, workers=BATCH_WORKERS, files_per_task=FILES_PER_TASK, max_in_flight=None):
+    """Yield decode results task by task, in input order, with a bounded number of tasks in flight."""
+    max_in_flight = max_in_flight or workers * 4
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = deque()
+        for chunk in _chunks(paths, files_per_task):
+            pending.append(executor.submit(_decode_task, chunk))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_feature_batches(paths, batch_size=MODEL_BATCH_SIZE, **decode_kwargs):
+    """Regroup decoded tasks into model-sized (paths, features, errors) batches."""
+    batch_paths, batch_features, batch_errors, rows = [], [], [], 0
+    for task_paths, features, errors in decode_in_order(paths, **decode_kwargs):
+        batch_paths.extend(task_paths)
+        batch_features.append(features)
+        batch_errors.extend(errors)
+        rows += len(task_paths)
+        if rows >= batch_size:
+            yield batch_paths, np.concatenate(batch_features), batch_errors
+            batch_paths, batch_features, batch_errors, rows = [], [], [], 0
+    if rows:
+        yield batch_paths, np.concatenate(batch_features), batch_errors
+
+
+def prefetch(iterator, depth=PREFETCH_BATCHES):
+    """Run `iterator` in a background thread, keeping up to `depth` items ready."""
+    items = queue.Queue(maxsize=max(1, depth))
+    done = object()
+    failure = []
+
+    def produce():
+        try:
+            for item in iterator:
+                items.put(item)
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            items.put(done)
+
+    threading.Thread(target=produce, name="batch-predict-prefetch", daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            break
+        yield item
+    if failure:
+        raise failure[0]
+
+
+class ResultWriter:
+    """Appends scored rows to CSV or Parquet as batches arrive."""
+
+    def __init__(self, path, labels):
+        self.path = path
+        self.columns = ['path', 'emotion', 'confidence'] + [f'p_{label}' for label in labels] + ['error']
+        self.parquet = path.lower().endswith('.parquet')
+        self._writer = None
+        self._file = None
+        self._schema = None
+        if self.parquet:
+            import pyarrow as pa
+            # Fixed up front: inferring it per batch types an all-None column as null,
+            # and the first batch with a value there would no longer match the file
+            self._schema = pa.schema(
+                [('path', pa.string()), ('emotion', pa.string()), ('confidence', pa.float32())]
+                + [(column, pa.float32()) for column in self.columns[3:-1]]
+                + [('error', pa.string())])
+        else:
+            self._file = open(path, 'w', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.columns)
+
+    def write(self, paths, emotions, confidences, probabilities, errors):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            data = {'path': paths, 'emotion': emotions, 'confidence': np.asarray(confidences, dtype=np.float32)}
+            for k, column in enumerate(self.columns[3:-1]):
+                data[column] = np.asarray(probabilities[:, k], dtype=np.float32)
+            data['error'] = errors
+            table = pa.table(data, schema=self._schema)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table)
+            return
+        for k, path in enumerate(paths):
+            if errors[k] is not None:
+                self._writer.writerow([path, '', ''] + [''] * probabilities.shape[1] + [errors[k]])
+            else:
+                self._writer.writerow([path, emotions[k], f"{confidences[k]:.6f}"]
+                                      + [f"{p:.6f}" for p in probabilities[k]] + [''])
+        self._file.flush()
+
+    def close(self):
+        if self.parquet:
+            if self._writer is not None:
+                self._writer.close()
+        else:
+            self._file.close()
+
+
+def load_emotion_model(model_path=None, encoder_path=None):
+    """The shared model handle and its labels from predict_only."""
+    import predict_only
+    return (predict_only.get_emotion_model(model_path),
+            predict_only.get_labels(encoder_path or predict_only.encoder_path))
+
+
+def score(source, output, model=None, labels=None, workers=BATCH_WORKERS, batch_size=MODEL_BATCH_SIZE,
+          files_per_task=FILES_PER_TASK, prefetch_batches=PREFETCH_BATCHES):
+    """Score every file under `source` and stream the results to `output` (.csv or .parquet).
+
+    Decoding runs in `workers` processes while the model scores the previous
+    batch; memory stays bounded by the in-flight tasks and prefetch depth,
+    not by the size of the archive.
+    """
+    if model is None:
+        model, labels = load_emotion_model()
+    labels = [str(label) for label in labels]
+    writer = ResultWriter(output, labels)
+    started = time.perf_counter()
+    scored = failed = 0
+    try:
+        batches = iter_feature_batches(iter_audio_paths(source), batch_size, workers=workers,
+                                       files_per_task=files_per_task)
+        for paths, features, errors in prefetch(batches, prefetch_batches):
+            ok = np.array([error is None for error in errors])
+            probabilities = np.full((len(paths), len(labels)), np.nan, dtype=np.float32)
+            if ok.any():
+                probabilities[ok] = np.asarray(model.predict_on_batch(features[ok][..., np.newaxis]))
+            best = np.nan_to_num(probabilities, nan=-1.0).argmax(axis=1)
+            emotions = [labels[b] if good else None for b, good in zip(best, ok)]
+            confidences = np.where(ok, np.nan_to_num(probabilities, nan=0.0).max(axis=1), np.nan)
+            writer.write(paths, emotions, confidences, probabilities, errors)
+            scored += int(ok.sum())
+            failed += int((~ok).sum())
+            elapsed = time.perf_counter() - started
+            print(f"Scored {scored} files ({failed} failed), {(scored + failed) / elapsed:.1f} files/s")
+    finally:
+        writer.close()
+    return scored, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an archive of recordings with the emotion model")
+    parser.add_argument("source", help="Directory to walk, or a manifest (one path per line or CSV with a path column)")
+    parser.add_argument("--output", default="predicted_emotions.csv", help=".csv or .parquet")
+    parser.add_argument("--model", default=None, help="Defaults to the model app.py serves")
+    parser.add_argument("--encoder", default=None)
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=MODEL_BATCH_SIZE)
+    parser.add_argument("--files-per-task", type=int, default=FILES_PER_TASK)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_BATCHES)
+    args = parser.parse_args(argv)
+    model, labels = load_emotion_model(args.model, args.encoder)
+    score(args.source, args.output, model, labels, args.workers, args.batch_size, args.files_per_task, args.prefetch)
+
+
+if __name__ == "__main__":
+    main()
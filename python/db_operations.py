@@ -1,9 +1,16 @@
 import os
 import json
+import queue
+import threading
+from contextlib import contextmanager
 import pyodbc
 from dotenv import load_dotenv
 load_dotenv()
 import hashlib
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "1000"))
+
 def get_db_connection():
     conn = pyodbc.connect(
         f"DRIVER={{ODBC Driver 17 for SQL Server}};"
@@ -17,134 +24,378 @@ def get_db_connection():
     )
     return conn
 
+class ConnectionPool:
+    """Keeps up to `max_size` open connections so writes skip the connect/TLS handshake.
+
+    `factory` creates a new connection (get_db_connection by default; a
+    sqlite3.connect wrapper works as a local stand-in). A connection that
+    raised during use is closed instead of being returned to the pool.
+    """
+
+    def __init__(self, factory=get_db_connection, max_size=DB_POOL_SIZE):
+        self.factory = factory
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.factory()
+            yield conn
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
 def hash_filename(filename):
     """Hash the filename using SHA256."""
     return hashlib.sha256(filename.encode('utf-8')).hexdigest()
 
-def insert_deepgram_results_to_db(results, filename):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Column order of DeepgramSpeechAnalysis rows (same as the InsertDeepgramSpeechAnalysis parameters).
+# Types are not repeated here: staging tables copy them from the real table.
+DEEPGRAM_COLUMNS = [
+    "filename",
+    "hashed_value",
+    "transcript",
+    "summary",
+    "sentiment",
+    "sentiment_score",
+    "entity_label",
+    "entity_value",
+    "entity_start_word",
+    "entity_end_word",
+    "entity_confidence",
+    "intent_label",
+    "intent_confidence",
+    "intent_start_word",
+    "intent_end_word",
+    "intent_text",
+    "topic_label",
+    "topic_confidence",
+    "topic_start_word",
+    "topic_end_word",
+    "topic_text",
+]
+
+def intent_segments(results):
+    """Deepgram intent segments; `intents` may be {"segments": [...]}, a bare list, or missing."""
+    intents = results.get('intents') or {}
+    return intents.get('segments', []) if isinstance(intents, dict) else intents
+
+def flatten_deepgram_results(results, filename):
+    """One DeepgramSpeechAnalysis row (in DEEPGRAM_COLUMNS order) for a Deepgram result."""
+    hashed_value = hash_filename(filename)
+    transcript = results.get('transcript', '')
+    summary = results.get('summary', '')
+    sentiment_data = results.get('sentiment', {})
+    sentiment = sentiment_data.get('sentiment', '')
+    sentiment_score = sentiment_data.get('sentiment_score', 0.0)
+
+    # ---- ENTITY aggregation ----
+    entities = results.get('entities', [])
+    entity_labels = [e.get('label', '') for e in entities]
+    entity_values = [e.get('value', '') for e in entities]
+    entity_confidences = [e.get('confidence', 0.0) for e in entities]
+    entity_start_words = [e.get('start_word', 0) for e in entities]
+    entity_end_words = [e.get('end_word', 0) for e in entities]
+
+    entity_label = ', '.join(entity_labels)
+    entity_value = ', '.join(entity_values)
+    entity_confidence = round(sum(entity_confidences) / len(entity_confidences), 4) if entity_confidences else 0.0
+    entity_start_word = min(entity_start_words) if entity_start_words else 0
+    entity_end_word = max(entity_end_words) if entity_end_words else 0
+
+    # ---- INTENT aggregation ----
+    segments = intent_segments(results)
+    intent_labels = []
+    intent_confidences = []
+    intent_texts = []
+    intent_start_words = []
+    intent_end_words = []
+
+    for seg in segments:
+        for intent in seg.get('intents', []):
+            intent_labels.append(intent.get('intent', ''))
+            intent_confidences.append(intent.get('confidence_score', 0.0))
+            intent_texts.append(seg.get('text', ''))
+            intent_start_words.append(seg.get('start_word', 0))
+            intent_end_words.append(seg.get('end_word', 0))
+
+    intent_label = ', '.join(intent_labels)
+    intent_text = ' '.join(intent_texts)
+    intent_confidence = round(sum(intent_confidences) / len(intent_confidences), 4) if intent_confidences else 0.0
+    intent_start_word = min(intent_start_words) if intent_start_words else 0
+    intent_end_word = max(intent_end_words) if intent_end_words else 0
+
+    # ---- TOPIC aggregation ----
+    topic_segments = results.get('topics', [])
+    topic_labels = []
+    topic_confidences = []
+    topic_texts = []
+    topic_start_words = []
+    topic_end_words = []
+
+    for topic_seg in topic_segments:
+        for topic in topic_seg.get('topics', []):
+            topic_labels.append(topic.get('topic', ''))
+            topic_confidences.append(topic.get('confidence_score', 0.0))
+            topic_texts.append(topic_seg.get('text', ''))
+            topic_start_words.append(topic_seg.get('start_word', 0))
+            topic_end_words.append(topic_seg.get('end_word', 0))
+
+    topic_label = ', '.join(topic_labels)
+    topic_text = ' '.join(topic_texts)
+    topic_confidence = round(sum(topic_confidences) / len(topic_confidences), 4) if topic_confidences else 0.0
+    topic_start_word = min(topic_start_words) if topic_start_words else 0
+    topic_end_word = max(topic_end_words) if topic_end_words else 0
+
+    return (
+        filename,
+        hashed_value,
+        transcript,
+        summary,
+        sentiment,
+        sentiment_score,
+        entity_label,
+        entity_value,
+        entity_start_word,
+        entity_end_word,
+        entity_confidence,
+        intent_label,
+        intent_confidence,
+        intent_start_word,
+        intent_end_word,
+        intent_text,
+        topic_label,
+        topic_confidence,
+        topic_start_word,
+        topic_end_word,
+        topic_text
+    )
+
+# Per-item child rows, one per entity / intent / topic, so label + confidence
+# queries are index seeks instead of LIKE scans over the joined strings above.
+DEEPGRAM_CHILD_TABLES = {
+    "DeepgramEntities": [
+        ("filename", "NVARCHAR(450)"),
+        ("hashed_value", "NVARCHAR(64)"),
+        ("label", "NVARCHAR(200)"),
+        ("value", "NVARCHAR(1000)"),
+        ("confidence", "FLOAT"),
+        ("start_word", "INT"),
+        ("end_word", "INT"),
+    ],
+    "DeepgramIntents": [
+        ("filename", "NVARCHAR(450)"),
+        ("hashed_value", "NVARCHAR(64)"),
+        ("label", "NVARCHAR(200)"),
+        ("text", "NVARCHAR(MAX)"),
+        ("confidence", "FLOAT"),
+        ("start_word", "INT"),
+        ("end_word", "INT"),
+    ],
+    "DeepgramTopics": [
+        ("filename", "NVARCHAR(450)"),
+        ("hashed_value", "NVARCHAR(64)"),
+        ("label", "NVARCHAR(200)"),
+        ("text", "NVARCHAR(MAX)"),
+        ("confidence", "FLOAT"),
+        ("start_word", "INT"),
+        ("end_word", "INT"),
+    ],
+}
+
+def extract_child_rows(results, filename):
+    """Rows for each child table (in DEEPGRAM_CHILD_TABLES column order)."""
     hashed_value = hash_filename(filename)
-    # Check for existing record
-    cursor.execute("SELECT COUNT(*) FROM DeepgramSpeechAnalysis WHERE filename = ?", (filename,))
-    exists = cursor.fetchone()[0] > 0
-
-    if exists:
-        # If file exists, update timestamp only
-        cursor.execute("UPDATE DeepgramSpeechAnalysis SET updated_at = CURRENT_TIMESTAMP WHERE filename = ?", (filename,))
-    else:
-        transcript = results.get('transcript', '')
-        summary = results.get('summary', '')
-        sentiment_data = results.get('sentiment', {})
-        sentiment = sentiment_data.get('sentiment', '')
-        sentiment_score = sentiment_data.get('sentiment_score', 0.0)
-
-        # ---- ENTITY aggregation ----
-        entities = results.get('entities', [])
-        entity_labels = [e.get('label', '') for e in entities]
-        entity_values = [e.get('value', '') for e in entities]
-        entity_confidences = [e.get('confidence', 0.0) for e in entities]
-        entity_start_words = [e.get('start_word', 0) for e in entities]
-        entity_end_words = [e.get('end_word', 0) for e in entities]
-
-        entity_label = ', '.join(entity_labels)
-        entity_value = ', '.join(entity_values)
-        entity_confidence = round(sum(entity_confidences) / len(entity_confidences), 4) if entity_confidences else 0.0
-        entity_start_word = min(entity_start_words) if entity_start_words else 0
-        entity_end_word = max(entity_end_words) if entity_end_words else 0
-
-        # ---- INTENT aggregation ----
-        segments = results.get('intents', {}).get('segments', [])
-        intent_labels = []
-        intent_confidences = []
-        intent_texts = []
-        intent_start_words = []
-        intent_end_words = []
-
-        for seg in segments:
-            for intent in seg.get('intents', []):
-                intent_labels.append(intent.get('intent', ''))
-                intent_confidences.append(intent.get('confidence_score', 0.0))
-                intent_texts.append(seg.get('text', ''))
-                intent_start_words.append(seg.get('start_word', 0))
-                intent_end_words.append(seg.get('end_word', 0))
-
-        intent_label = ', '.join(intent_labels)
-        intent_text = ' '.join(intent_texts)
-        intent_confidence = round(sum(intent_confidences) / len(intent_confidences), 4) if intent_confidences else 0.0
-        intent_start_word = min(intent_start_words) if intent_start_words else 0
-        intent_end_word = max(intent_end_words) if intent_end_words else 0
-
-        # ---- TOPIC aggregation ----
-        topic_segments = results.get('topics', [])
-        topic_labels = []
-        topic_confidences = []
-        topic_texts = []
-        topic_start_words = []
-        topic_end_words = []
-
-        for topic_seg in topic_segments:
-            for topic in topic_seg.get('topics', []):
-                topic_labels.append(topic.get('topic', ''))
-                topic_confidences.append(topic.get('confidence_score', 0.0))
-                topic_texts.append(topic_seg.get('text', ''))
-                topic_start_words.append(topic_seg.get('start_word', 0))
-                topic_end_words.append(topic_seg.get('end_word', 0))
-
-        topic_label = ', '.join(topic_labels)
-        topic_text = ' '.join(topic_texts)
-        topic_confidence = round(sum(topic_confidences) / len(topic_confidences), 4) if topic_confidences else 0.0
-        topic_start_word = min(topic_start_words) if topic_start_words else 0
-        topic_end_word = max(topic_end_words) if topic_end_words else 0
-
-        # ---- SINGLE EXEC for all data ----
-        cursor.execute("""
-            EXEC InsertDeepgramSpeechAnalysis 
-                @filename = ?, 
-                @hashed_value = ?, 
-                @transcript = ?, 
-                @summary = ?, 
-                @sentiment = ?, 
-                @sentiment_score = ?, 
-                @entity_label = ?, 
-                @entity_value = ?, 
-                @entity_start_word = ?, 
-                @entity_end_word = ?, 
-                @entity_confidence = ?, 
-                @intent_label = ?, 
-                @intent_confidence = ?, 
-                @intent_start_word = ?, 
-                @intent_end_word = ?, 
-                @intent_text = ?, 
-                @topic_label = ?, 
-                @topic_confidence = ?, 
-                @topic_start_word = ?, 
-                @topic_end_word = ?, 
-                @topic_text = ?
-        """, (
-            filename,
-            hashed_value,
-            transcript,
-            summary,
-            sentiment,
-            sentiment_score,
-            entity_label,
-            entity_value,
-            entity_start_word,
-            entity_end_word,
-            entity_confidence,
-            intent_label,
-            intent_confidence,
-            intent_start_word,
-            intent_end_word,
-            intent_text,
-            topic_label,
-            topic_confidence,
-            topic_start_word,
-            topic_end_word,
-            topic_text
-        ))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    entities = [
+        (filename, hashed_value, e.get('label', ''), e.get('value', ''), e.get('confidence', 0.0),
+         e.get('start_word', 0), e.get('end_word', 0))
+        for e in results.get('entities', [])
+    ]
+    intents = [
+        (filename, hashed_value, intent.get('intent', ''), seg.get('text', ''), intent.get('confidence_score', 0.0),
+         seg.get('start_word', 0), seg.get('end_word', 0))
+        for seg in intent_segments(results)
+        for intent in seg.get('intents', [])
+    ]
+    topics = [
+        (filename, hashed_value, topic.get('topic', ''), topic_seg.get('text', ''), topic.get('confidence_score', 0.0),
+         topic_seg.get('start_word', 0), topic_seg.get('end_word', 0))
+        for topic_seg in results.get('topics', [])
+        for topic in topic_seg.get('topics', [])
+    ]
+    return {"DeepgramEntities": entities, "DeepgramIntents": intents, "DeepgramTopics": topics}
+
+def _is_sqlite(conn):
+    return type(conn).__module__.startswith('sqlite3')
+
+_schema_ready = set()
+
+def ensure_child_tables(cursor, sqlite=False):
+    """Create the child tables and their (label, confidence) / filename indexes if missing."""
+    for table, columns in DEEPGRAM_CHILD_TABLES.items():
+        if sqlite:
+            column_defs = ", ".join(f"{name} {'TEXT' if 'CHAR' in sql_type else sql_type}" for name, sql_type in columns)
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, {column_defs})")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS IX_{table}_label_confidence ON {table} (label, confidence)")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS IX_{table}_filename ON {table} (filename)")
+        else:
+            column_defs = ", ".join(f"{name} {sql_type}" for name, sql_type in columns)
+            cursor.execute(f"""
+                IF OBJECT_ID('{table}', 'U') IS NULL
+                BEGIN
+                    CREATE TABLE {table} (id BIGINT IDENTITY(1,1) PRIMARY KEY, {column_defs});
+                    CREATE INDEX IX_{table}_label_confidence ON {table} (label, confidence) INCLUDE (filename);
+                    CREATE INDEX IX_{table}_filename ON {table} (filename);
+                END
+            """)
+
+def _upsert_rows_mssql(cursor, rows, children):
+    # Stage the batch with one fast_executemany round trip, then upsert it set-based:
+    # existing filenames only get updated_at bumped, new ones are inserted.
+    names = DEEPGRAM_COLUMNS
+    column_list = ", ".join(names)
+    # Column types come from the real table, so staging never truncates what the target accepts
+    cursor.execute(f"SELECT TOP 0 {column_list} INTO #DeepgramStaging FROM DeepgramSpeechAnalysis")
+    cursor.fast_executemany = True
+    cursor.executemany(
+        f"INSERT INTO #DeepgramStaging ({column_list}) VALUES ({', '.join('?' for _ in names)})",
+        rows
+    )
+    # Child rows only for calls that are new, i.e. not yet in the parent table
+    for table, child_rows in children.items():
+        if not child_rows:
+            continue
+        columns = DEEPGRAM_CHILD_TABLES[table]
+        child_list = ", ".join(name for name, _ in columns)
+        cursor.execute(f"SELECT TOP 0 {child_list} INTO #{table}Staging FROM {table}")
+        cursor.executemany(
+            f"INSERT INTO #{table}Staging ({child_list}) VALUES ({', '.join('?' for _ in columns)})",
+            child_rows
+        )
+        cursor.execute(f"""
+            INSERT INTO {table} ({child_list})
+            SELECT {child_list} FROM #{table}Staging AS source
+            WHERE NOT EXISTS (SELECT 1 FROM DeepgramSpeechAnalysis AS target WHERE target.filename = source.filename)
+        """)
+        cursor.execute(f"DROP TABLE #{table}Staging")
+    cursor.execute(f"""
+        MERGE DeepgramSpeechAnalysis AS target
+        USING #DeepgramStaging AS source
+            ON target.filename = source.filename
+        WHEN MATCHED THEN
+            UPDATE SET updated_at = CURRENT_TIMESTAMP
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT ({column_list})
+            VALUES ({', '.join('source.' + name for name in names)});
+    """)
+    # On failure the pool discards the connection, which drops the temp tables with it
+    cursor.execute("DROP TABLE #DeepgramStaging")
+
+def _upsert_rows_sqlite(cursor, rows, children):
+    names = DEEPGRAM_COLUMNS
+    filenames = [row[0] for row in rows]
+    cursor.execute(
+        f"SELECT filename FROM DeepgramSpeechAnalysis WHERE filename IN ({', '.join('?' for _ in filenames)})",
+        filenames
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    for table, child_rows in children.items():
+        columns = [name for name, _ in DEEPGRAM_CHILD_TABLES[table]]
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [row for row in child_rows if row[0] not in existing]
+        )
+    cursor.executemany(f"""
+        INSERT INTO DeepgramSpeechAnalysis ({', '.join(names)})
+        VALUES ({', '.join('?' for _ in names)})
+        ON CONFLICT(filename) DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+    """, rows)
+
+def insert_deepgram_results_batch(items, pool=None, batch_size=DB_BATCH_SIZE):
+    """Upsert many (results, filename) pairs over one pooled connection and transaction.
+
+    The flattened DeepgramSpeechAnalysis row and the per-item child rows are
+    written together; rows are sent `batch_size` calls at a time. When a
+    filename appears more than once, the last result wins.
+    """
+    latest = {}
+    for results, filename in items:
+        latest[filename] = results
+    if not latest:
+        return 0
+    filenames = list(latest)
+
+    pool = pool or get_connection_pool()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        sqlite = _is_sqlite(conn)
+        upsert = _upsert_rows_sqlite if sqlite else _upsert_rows_mssql
+        try:
+            if id(pool) not in _schema_ready:
+                ensure_child_tables(cursor, sqlite)
+                _schema_ready.add(id(pool))
+            for i in range(0, len(filenames), batch_size):
+                chunk = filenames[i:i + batch_size]
+                rows = [flatten_deepgram_results(latest[filename], filename) for filename in chunk]
+                children = {table: [] for table in DEEPGRAM_CHILD_TABLES}
+                for filename in chunk:
+                    for table, child_rows in extract_child_rows(latest[filename], filename).items():
+                        children[table].extend(child_rows)
+                upsert(cursor, rows, children)
+            conn.commit()
+        finally:
+            cursor.close()
+    return len(filenames)
+
+def insert_deepgram_results_to_db(results, filename):
+    insert_deepgram_results_batch([(results, filename)])
+
+def find_calls_by_label(table, label, min_confidence=0.0, pool=None):
+    """Filenames with a `table` item (e.g. "DeepgramIntents") labelled `label` at or above `min_confidence`."""
+    if table not in DEEPGRAM_CHILD_TABLES:
+        raise ValueError(f"Unknown child table: {table}")
+    pool = pool or get_connection_pool()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT DISTINCT filename FROM {table} WHERE label = ? AND confidence >= ?",
+                (label, min_confidence)
+            )
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
@@ -0,0 +1,150 @@
+import os
+import random
+import mimetypes
+import asyncio
+import threading
+import aiohttp
+import background_loop
+from DeepTranscript import DEEPGRAM_API_URL, DEEPGRAM_PARAMS, parse_deepgram_response
+
+DEEPGRAM_CONCURRENCY = int(os.getenv("DEEPGRAM_CONCURRENCY", "8"))
+DEEPGRAM_TIMEOUT_SECONDS = float(os.getenv("DEEPGRAM_TIMEOUT_SECONDS", "300"))
+DEEPGRAM_MAX_RETRIES = int(os.getenv("DEEPGRAM_MAX_RETRIES", "4"))
+DEEPGRAM_BACKOFF_BASE_SECONDS = float(os.getenv("DEEPGRAM_BACKOFF_BASE_SECONDS", "0.5"))
+DEEPGRAM_BACKOFF_MAX_SECONDS = float(os.getenv("DEEPGRAM_BACKOFF_MAX_SECONDS", "30"))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# "direct" streams the uploaded bytes to Deepgram; "url" has Deepgram fetch them through ngrok
+DEEPGRAM_UPLOAD_MODE = os.getenv("DEEPGRAM_UPLOAD_MODE", "direct")
+
+
+class DeepgramError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class AsyncDeepgramClient:
+    """Deepgram /v1/listen client sharing one aiohttp connection pool.
+
+    At most `concurrency` requests are in flight at once. 429 and 5xx
+    responses, connection errors and timeouts are retried with exponential
+    backoff and full jitter, honouring Retry-After when Deepgram sends it.
+    `base_url` can point at a local stub server.
+    """
+
+    def __init__(self, api_key=None, base_url=DEEPGRAM_API_URL, concurrency=DEEPGRAM_CONCURRENCY,
+                 timeout=DEEPGRAM_TIMEOUT_SECONDS, max_retries=DEEPGRAM_MAX_RETRIES,
+                 backoff_base=DEEPGRAM_BACKOFF_BASE_SECONDS, backoff_max=DEEPGRAM_BACKOFF_MAX_SECONDS,
+                 params=None):
+        self.api_key = api_key if api_key is not None else os.getenv("DEEPGRAM_API_KEY")
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.params = dict(DEEPGRAM_PARAMS if params is None else params)
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=self.timeout,
+                headers={"Authorization": f"Token {self.api_key}"},
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _post(self, make_request_kwargs):
+        """POST with retries; `make_request_kwargs()` builds a fresh body per attempt."""
+        await self.open()
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    async with self._session.post(self.base_url, params=self.params,
+                                                  **make_request_kwargs()) as response:
+                        if response.status < 400:
+                            return await response.json(content_type=None)
+                        text = await response.text()
+                        if response.status not in RETRYABLE_STATUSES or attempt == self.max_retries:
+                            raise DeepgramError(f"Deepgram API error: {text}", response.status)
+                        retry_after = response.headers.get("Retry-After")
+                        print(f"⚠️ Deepgram returned {response.status}, retrying (attempt {attempt + 1})")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt == self.max_retries:
+                        raise DeepgramError(f"Deepgram request failed: {e!r}") from e
+                    print(f"⚠️ Deepgram request failed ({e!r}), retrying (attempt {attempt + 1})")
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    async def analyze_url(self, audio_url):
+        response_json = await self._post(lambda: {"json": {"url": audio_url}})
+        return parse_deepgram_response(response_json)
+
+    async def analyze_urls(self, audio_urls):
+        """Results in input order; failed items are returned as exceptions."""
+        return await asyncio.gather(*(self.analyze_url(url) for url in audio_urls), return_exceptions=True)
+
+    async def analyze_file(self, file_path):
+        """Send the file itself as the request body.
+
+        aiohttp streams an open file from disk in chunks with a Content-Length,
+        so the audio is never held in memory as a whole; each retry reopens it.
+        """
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+
+        def request_kwargs():
+            return {"data": open(file_path, 'rb'), "headers": {"Content-Type": content_type}}
+
+        response_json = await self._post(request_kwargs)
+        return parse_deepgram_response(response_json)
+
+    async def analyze_files(self, file_paths):
+        """Results in input order; failed items are returned as exceptions."""
+        return await asyncio.gather(*(self.analyze_file(path) for path in file_paths), return_exceptions=True)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AsyncDeepgramClient()
+        return _client
+
+
+def run_on_client(make_coroutine):
+    """Run `make_coroutine(client)` on the shared client from synchronous code."""
+    return background_loop.run(make_coroutine(get_client()))
+
+
+def analyze_urls(audio_urls):
+    return run_on_client(lambda client: client.analyze_urls(audio_urls))
+
+
+def analyze_files(file_paths):
+    return run_on_client(lambda client: client.analyze_files(file_paths))
@@ -0,0 +1,102 @@
+import os
+import threading
+import numpy as np
+
+# Runtimes the emotion model can be served from; each needs its own artifact (see export_model.py)
+BACKEND_EXTENSIONS = {"keras": ".h5", "tflite": ".tflite", "onnx": ".onnx"}
+INFERENCE_THREADS = int(os.getenv("EMOTION_INFERENCE_THREADS", "1"))
+
+
+def _tflite_interpreter_class():
+    # Prefer the standalone runtimes so TensorFlow itself never has to be imported
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteModel:
+    """TFLite interpreter with the `predict_on_batch` interface the callers use.
+
+    The input tensor is resized to the incoming batch size when it changes.
+    Interpreters are not thread safe, so calls are serialised.
+    """
+
+    def __init__(self, path, num_threads=INFERENCE_THREADS):
+        self.path = path
+        self._interpreter = _tflite_interpreter_class()(model_path=path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def _quantize(self, x):
+        scale, zero_point = self._input['quantization']
+        if np.issubdtype(self._input['dtype'], np.integer) and scale:
+            info = np.iinfo(self._input['dtype'])
+            return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(self._input['dtype'])
+        return x.astype(self._input['dtype'])
+
+    def _dequantize(self, y):
+        scale, zero_point = self._output['quantization']
+        if np.issubdtype(self._output['dtype'], np.integer) and scale:
+            return (y.astype(np.float32) - zero_point) * scale
+        return y.astype(np.float32)
+
+    def predict_on_batch(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        with self._lock:
+            if self._batch_size != len(x):
+                self._interpreter.resize_tensor_input(self._input['index'], list(x.shape))
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(x)
+            self._interpreter.set_tensor(self._input['index'], self._quantize(x))
+            self._interpreter.invoke()
+            return self._dequantize(self._interpreter.get_tensor(self._output['index']))
+
+
+class OnnxModel:
+    """onnxruntime session with the `predict_on_batch` interface the callers use."""
+
+    def __init__(self, path, num_threads=INFERENCE_THREADS):
+        import onnxruntime as ort
+        self.path = path
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_name = self._session.get_inputs()[0].name
+        self._input_type = self._session.get_inputs()[0].type
+
+    def predict_on_batch(self, x):
+        x = np.asarray(x, dtype=np.float16 if self._input_type == 'tensor(float16)' else np.float32)
+        return self._session.run(None, {self._input_name: x})[0].astype(np.float32)
+
+
+def backend_for_path(path):
+    """Runtime implied by an artifact's extension ("keras" for .h5/.keras)."""
+    ext = os.path.splitext(path)[1].lower()
+    return next((name for name, known in BACKEND_EXTENSIONS.items() if known == ext), "keras")
+
+
+def load_emotion_backend(backend, path):
+    """Load `path` with the given runtime; every backend exposes `predict_on_batch`."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file not found: {path}")
+    if backend == "keras":
+        from keras.models import load_model
+        return load_model(path)
+    if backend == "tflite":
+        return TFLiteModel(path)
+    if backend == "onnx":
+        return OnnxModel(path)
+    raise ValueError(f"Unknown emotion backend: {backend} (expected one of {', '.join(BACKEND_EXTENSIONS)})")
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from features import extract_file_windows, WINDOW_SECONDS, HOP_SECONDS
+
+# Windows per forward pass when scoring a whole call
+TIMELINE_BATCH_SIZE = int(os.getenv("EMOTION_TIMELINE_BATCH_SIZE", "512"))
+
+
+def score_windows(model, windows, batch_size=TIMELINE_BATCH_SIZE):
+    """Softmax rows for an (n_windows, 40) matrix, `batch_size` windows per pass."""
+    windows = np.asarray(windows, dtype=np.float32)
+    probs = [np.asarray(model.predict_on_batch(windows[i:i + batch_size, :, np.newaxis]))
+             for i in range(0, len(windows), batch_size)]
+    return np.concatenate(probs, axis=0)
+
+
+def merge_segments(windows):
+    """Collapse consecutive windows with the same label into segments.
+
+    Windows overlap when the hop is shorter than the window, so a segment
+    ends where the next differently-labelled window starts.
+    """
+    segments = []
+    for window in windows:
+        last = segments[-1] if segments else None
+        if last is not None and last["emotion"] == window["emotion"]:
+            last["end"] = window["end"]
+            last["windows"] += 1
+            last["confidence"] += (window["confidence"] - last["confidence"]) / last["windows"]
+        else:
+            if last is not None:
+                last["end"] = min(last["end"], window["start"])
+            segments.append({
+                "emotion": window["emotion"],
+                "start": window["start"],
+                "end": window["end"],
+                "confidence": window["confidence"],
+                "windows": 1,
+            })
+    for segment in segments:
+        segment["confidence"] = round(segment["confidence"], 4)
+    return segments
+
+
+def build_timeline(probs, start_times, duration, labels, window_seconds=WINDOW_SECONDS):
+    """Per-window labels and merged segments covering 0 to `duration`.
+
+    The last window is end-aligned to the final MFCC frame, so it is
+    stretched to `duration` to cover the sub-frame remainder as well.
+    """
+    predicted = np.argmax(probs, axis=1)
+    confidences = probs[np.arange(len(probs)), predicted]
+    windows = []
+    for start, label, confidence in zip(start_times, predicted, confidences):
+        windows.append({
+            "start": round(float(start), 3),
+            "end": round(float(min(start + window_seconds, duration)), 3),
+            "emotion": str(labels[label]),
+            "confidence": float(confidence),
+        })
+    if windows:
+        windows[-1]["end"] = round(float(duration), 3)
+    segments = merge_segments(windows)
+    for window in windows:
+        window["confidence"] = round(window["confidence"], 4)
+    return {"duration": round(float(duration), 3), "windows": windows, "segments": segments}
+
+
+def timeline_from_windows(model, labels, windows, start_times, duration, window_seconds=WINDOW_SECONDS):
+    probs = score_windows(model, windows)
+    return build_timeline(probs, start_times, duration, labels, window_seconds)
+
+
+def predict_timeline(model, labels, filename, window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS):
+    """Emotion label and confidence for every window of `filename`, plus merged segments."""
+    windows, start_times, duration = extract_file_windows(filename, window_seconds, hop_seconds)
+    return timeline_from_windows(model, labels, windows, start_times, duration, window_seconds)
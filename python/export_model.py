@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+from emotion_backends import load_emotion_backend, backend_for_path
+
+SOURCE_MODEL = 'emotion_recognition_model.h5'
+INPUT_SHAPE = (40, 1)
+CALIBRATION_SAMPLES = 500
+
+
+def _calibration_features(data_dir, limit=CALIBRATION_SAMPLES):
+    """(features, labels) from a TESS-style directory, through the cached feature store."""
+    from train_and_save_model import list_dataset
+    from feature_store import load_features
+    df = list_dataset(data_dir, max_files=0)
+    X, kept_paths = load_features(list(df['speech']))
+    labels = df.set_index('speech').loc[kept_paths, 'label'].to_numpy()
+    order = np.random.default_rng(0).permutation(len(X))[:limit] if limit else np.arange(len(X))
+    return np.asarray(X, dtype=np.float32)[order], labels[order]
+
+
+def export_tflite(model, output, quantize="none", calibration=None, allow_flex_ops=False):
+    """Convert to TFLite; returns True when the artifact needs the Flex (select TF ops) delegate.
+
+    Flex artifacts only run on full TensorFlow's tf.lite.Interpreter, not on
+    ai-edge-litert or tflite_runtime, so the fallback must be allowed explicitly.
+    """
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if calibration is not None:
+            # Full-integer kernels where possible; float fallback keeps unsupported LSTM parts working
+            def representative_dataset():
+                for row in calibration[:CALIBRATION_SAMPLES]:
+                    yield [row.reshape(1, *INPUT_SHAPE)]
+            converter.representative_dataset = representative_dataset
+        # Without calibration data this is dynamic-range (int8 weight) quantization
+    requires_flex_ops = False
+    try:
+        tflite_model = converter.convert()
+    except Exception as e:
+        if not allow_flex_ops:
+            raise RuntimeError(f"Builtin-only TFLite conversion failed ({e}). Re-run with --allow-flex-ops to "
+                               "fall back to select TF ops; serving that artifact needs full TensorFlow.") from e
+        print(f"⚠️ Builtin-only conversion failed ({e}), retrying with select TF ops")
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+        tflite_model = converter.convert()
+        requires_flex_ops = True
+        print("⚠️ The artifact needs the Flex delegate: serve it with full TensorFlow installed, "
+              "ai-edge-litert and tflite_runtime cannot run it")
+    with open(output, 'wb') as f:
+        f.write(tflite_model)
+    return requires_flex_ops
+
+
+def export_onnx(model, output, quantize="none"):
+    import tensorflow as tf
+    import tf2onnx
+    spec = [tf.TensorSpec((None, *INPUT_SHAPE), tf.float32, name="mfcc")]
+    if quantize == "none":
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=output)
+        return
+    float_path = f"{output}.float.onnx"
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=float_path)
+    try:
+        if quantize == "int8":
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(float_path, output, weight_type=QuantType.QInt8)
+        else:
+            import onnx
+            from onnxconverter_common import float16
+            onnx.save(float16.convert_float_to_float16(onnx.load(float_path)), output)
+    finally:
+        os.remove(float_path)
+
+
+def _latency(model, X, repeats=200, batch_size=256):
+    """Single-row latency percentiles (ms) and batched throughput (rows/s)."""
+    rows = X[:, :, np.newaxis]
+    model.predict_on_batch(rows[:1])  # warm up
+    timings = []
+    for k in range(repeats):
+        started = time.perf_counter()
+        model.predict_on_batch(rows[k % len(rows):k % len(rows) + 1])
+        timings.append((time.perf_counter() - started) * 1000)
+    batch = np.resize(rows, (batch_size, *INPUT_SHAPE))
+    started = time.perf_counter()
+    for _ in range(10):
+        model.predict_on_batch(batch)
+    throughput = 10 * batch_size / (time.perf_counter() - started)
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p99_ms": round(float(np.percentile(timings, 99)), 3),
+        "batch_rows_per_second": round(throughput, 1),
+    }
+
+
+def _serving_rss_mb(backend, path):
+    """Peak RSS of a fresh process that loads `path` with `backend` and scores a few rows."""
+    script = (
+        "import sys, resource, numpy as np\n"
+        f"sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})\n"
+        "from emotion_backends import load_emotion_backend\n"
+        f"m = load_emotion_backend({backend!r}, {path!r})\n"
+        "m.predict_on_batch(np.zeros((32, 40, 1), np.float32))\n"
+        "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+    )
+    try:
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, timeout=600)
+        return round(int(out.stdout.strip().splitlines()[-1]) / 1024, 1)  # ru_maxrss is KiB on Linux
+    except Exception as e:
+        print(f"⚠️ Could not measure RSS for {path}: {e}")
+        return None
+
+
+def compare(reference, candidate_path, X, labels=None, class_names=None):
+    """Accuracy/agreement and latency of an exported model against the Keras reference."""
+    candidate = load_emotion_backend(backend_for_path(candidate_path), candidate_path)
+    ref_probs = np.asarray(reference.predict_on_batch(X[:, :, np.newaxis]))
+    cand_probs = np.asarray(candidate.predict_on_batch(X[:, :, np.newaxis]))
+    report = {
+        "artifact": candidate_path,
+        "size_bytes": os.path.getsize(candidate_path),
+        "top1_agreement": round(float(np.mean(ref_probs.argmax(1) == cand_probs.argmax(1))), 4),
+        "max_abs_prob_diff": round(float(np.max(np.abs(ref_probs - cand_probs))), 5),
+        "latency": _latency(candidate, X),
+        "reference_latency": _latency(reference, X),
+        "serving_rss_mb": _serving_rss_mb(backend_for_path(candidate_path), candidate_path),
+    }
+    if labels is not None and class_names is not None:
+        names = np.asarray([str(c) for c in class_names])
+        report["accuracy"] = round(float(np.mean(names[cand_probs.argmax(1)] == labels)), 4)
+        report["reference_accuracy"] = round(float(np.mean(names[ref_probs.argmax(1)] == labels)), 4)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the emotion model to TFLite/ONNX and compare it with Keras")
+    parser.add_argument("--model", default=SOURCE_MODEL)
+    parser.add_argument("--format", choices=["tflite", "onnx"], default="tflite")
+    parser.add_argument("--quantize", choices=["none", "float16", "int8"], default="none")
+    parser.add_argument("--output", help="Defaults to emotion_recognition_model[.<quantize>].<format>")
+    parser.add_argument("--data-dir", help="Labelled audio for int8 calibration and the accuracy report")
+    parser.add_argument("--encoder", default="label_encoder.pkl")
+    parser.add_argument("--report", default="export_report.json")
+    parser.add_argument("--allow-flex-ops", action="store_true",
+                        help="Fall back to select TF ops if builtin conversion fails (needs full TensorFlow to serve)")
+    args = parser.parse_args(argv)
+
+    from keras.models import load_model
+    model = load_model(args.model)
+    suffix = "" if args.quantize == "none" else f".{args.quantize}"
+    output = args.output or f"{os.path.splitext(args.model)[0]}{suffix}.{args.format}"
+
+    X = labels = None
+    if args.data_dir:
+        X, labels = _calibration_features(args.data_dir)
+
+    started = time.perf_counter()
+    requires_flex_ops = False
+    if args.format == "tflite":
+        requires_flex_ops = export_tflite(model, output, args.quantize, X, args.allow_flex_ops)
+    else:
+        export_onnx(model, output, args.quantize)
+    print(f"Wrote {output} in {time.perf_counter() - started:.1f}s")
+
+    class_names = None
+    if X is None:
+        # No audio given: compare on synthetic MFCC-like vectors (agreement and latency only)
+        X = np.random.default_rng(0).normal(0, 50, size=(CALIBRATION_SAMPLES, INPUT_SHAPE[0])).astype(np.float32)
+    elif os.path.exists(args.encoder):
+        import pickle
+        with open(args.encoder, 'rb') as f:
+            class_names = pickle.load(f).categories_[0]
+    report = compare(model, output, X, labels, class_names)
+    report["reference_size_bytes"] = os.path.getsize(args.model)
+    report["reference_serving_rss_mb"] = _serving_rss_mb("keras", args.model)
+    report["requires_flex_ops"] = requires_flex_ops
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Serve it with EMOTION_BACKEND={args.format} EMOTION_MODEL_PATH={output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,140 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.textanalytics import TextAnalyticsClient
+from llm_memo import get_memo_store
 
 text_analytics_endpoint = "https://languagecenter-ivr.cognitiveservices.azure.com/"
 text_analytics_key = "DmeqkR5UXieB1BBxdCvcqitBbEGfEnhAEV4O8Mv2H79nfMMT2V3PJQQJ99BCACYeBjFXJ3w3AAAaACOGQpNI"
 
-text_analytics_client = TextAnalyticsClient(endpoint=text_analytics_endpoint, credential=AzureKeyCredential(text_analytics_key))
+_text_analytics_client = None
+_text_analytics_client_lock = threading.Lock()
+
+
+def get_text_analytics_client():
+    """Shared Text Analytics client, created on first use rather than at import."""
+    global _text_analytics_client
+    with _text_analytics_client_lock:
+        if _text_analytics_client is None:
+            _text_analytics_client = TextAnalyticsClient(endpoint=text_analytics_endpoint,
+                                                         credential=AzureKeyCredential(text_analytics_key))
+        return _text_analytics_client
+
+SUMMARY_MEMO_VERSION = "textanalytics:abstract+extract:v1"
+# Text Analytics summarization limits: documents and characters per request
+SUMMARY_MAX_DOCS_PER_REQUEST = int(os.getenv("SUMMARY_MAX_DOCS_PER_REQUEST", "25"))
+SUMMARY_MAX_REQUEST_CHARS = int(os.getenv("SUMMARY_MAX_REQUEST_CHARS", "125000"))
+# Long transcripts are split into pieces of this size and their summaries joined
+SUMMARY_MAX_DOC_CHARS = int(os.getenv("SUMMARY_MAX_DOC_CHARS", "20000"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+
+
+def _document_text(doc):
+    return doc['text'] if isinstance(doc, dict) else doc
+
+
+def _summary_memo_version(doc):
+    language = doc.get('language', 'en') if isinstance(doc, dict) else 'en'
+    return f"{SUMMARY_MEMO_VERSION}:{language}"
+
 
 def generateSummary(text_documents,text_analytics_client):
+    """Abstract and extract summary per document; documents seen before come from the memo store."""
     print("text documents:",text_documents)
     if not text_documents:
         return {"abstract_summary": "", "extract_summary": ""}
-    poller_abstract = text_analytics_client.begin_abstract_summary(text_documents)
-    abstract_summary_results = poller_abstract.result()
-    # Generate Extract Summary
-    poller_extract = text_analytics_client.begin_extract_summary(text_documents)
-    extract_summary_results = poller_extract.result()
-    abstract_summaries = []
-    extract_summaries = []
-    for result in abstract_summary_results:
-        if result.kind == "AbstractiveSummarization":
-            # Extract only the first 3 sentences for a shorter summary
-            abstract_summary = " ".join([summary.text for summary in result.summaries])  # Limit to 3 lines
-            abstract_summaries.append(abstract_summary)
-        elif result.is_error is True:
-            return f"Error: {result.error.code} - {result.error.message}"
-    for result in extract_summary_results:
-        print("Extractive Summary API Raw Response:", result)  # Debugging
-        if result.kind == "ExtractiveSummarization":
-            lst_sentences = [sentence.text for sentence in result.sentences]  # No limit
-            extract_summary = "\n".join(lst_sentences)
-            print("Extractive Summary (Processed):", extract_summary)  # Debugging
-            extract_summaries.append(extract_summary)
-        elif result.is_error is True:
-            return f"Error: {result.error.code} - {result.error.message}"
-
-
-    return {"abstract_summaries": abstract_summaries, "extract_summaries": extract_summaries}
-
-   
+    memo = get_memo_store()
+    summaries = [memo.get("summary", _summary_memo_version(doc), _document_text(doc)) for doc in text_documents]
+
+    misses = [k for k, summary in enumerate(summaries) if summary is None]
+    if misses:
+        fresh = summarize_documents([text_documents[k] for k in misses], text_analytics_client)
+        if isinstance(fresh, str):
+            return fresh
+        for k, summary in zip(misses, fresh):
+            doc = text_documents[k]
+            memo.set("summary", _summary_memo_version(doc), _document_text(doc), summary)
+            summaries[k] = summary
+
+    return {"abstract_summaries": [summary["abstract"] for summary in summaries],
+            "extract_summaries": [summary["extract"] for summary in summaries]}
+
+
+def split_text(text, max_chars):
+    """Split `text` into pieces of at most `max_chars`, preferring sentence then word boundaries."""
+    pieces = []
+    while len(text) > max_chars:
+        window = text[:max_chars]
+        cut = max(window.rfind(". "), window.rfind("? "), window.rfind("! "), window.rfind("\n"))
+        if cut < max_chars // 2:
+            cut = window.rfind(" ")
+        cut = cut + 1 if cut > 0 else max_chars
+        pieces.append(text[:cut].strip())
+        text = text[cut:].lstrip()
+    if text or not pieces:
+        pieces.append(text)
+    return pieces
+
+
+def chunk_documents(text_documents, max_docs=SUMMARY_MAX_DOCS_PER_REQUEST,
+                    max_request_chars=SUMMARY_MAX_REQUEST_CHARS, max_doc_chars=SUMMARY_MAX_DOC_CHARS):
+    """Split documents into service-sized pieces and group the pieces into requests.
+
+    Returns (requests, owners): each request is a list of TA documents and
+    owners[r][p] is the index of the input document that piece p came from.
+    Pieces stay in input order, so a document's pieces are consecutive.
+    """
+    requests, owners = [], []
+    current, current_owners, current_chars = [], [], 0
+    for k, doc in enumerate(text_documents):
+        language = doc.get('language', 'en') if isinstance(doc, dict) else 'en'
+        for p, piece in enumerate(split_text(_document_text(doc), max_doc_chars)):
+            if current and (len(current) >= max_docs or current_chars + len(piece) > max_request_chars):
+                requests.append(current)
+                owners.append(current_owners)
+                current, current_owners, current_chars = [], [], 0
+            current.append({'id': f"{k}-{p}", 'language': language, 'text': piece})
+            current_owners.append(k)
+            current_chars += len(piece)
+    if current:
+        requests.append(current)
+        owners.append(current_owners)
+    return requests, owners
+
+
+def _run_summary_request(text_analytics_client, kind, documents):
+    if kind == "abstract":
+        poller = text_analytics_client.begin_abstract_summary(documents)
+    else:
+        poller = text_analytics_client.begin_extract_summary(documents)
+    return list(poller.result())
+
+
+def summarize_documents(text_documents,text_analytics_client):
+    """[{"abstract", "extract"}] in document order, or an error string.
+
+    Abstractive and extractive summaries of every request-sized chunk run as
+    separate long-running operations in parallel, so latency is about the
+    slowest chunk. Long documents are split and their piece summaries joined.
+    """
+    requests, owners = chunk_documents(text_documents)
+    jobs = [(kind, r) for r in range(len(requests)) for kind in ("abstract", "extract")]
+    with ThreadPoolExecutor(max_workers=min(SUMMARY_CONCURRENCY, len(jobs))) as executor:
+        futures = [executor.submit(_run_summary_request, text_analytics_client, kind, requests[r]) for kind, r in jobs]
+        responses = [future.result() for future in futures]
+
+    abstract_pieces = [[] for _ in text_documents]
+    extract_pieces = [[] for _ in text_documents]
+    for (kind, r), results in zip(jobs, responses):
+        for owner, result in zip(owners[r], results):
+            if result.is_error is True:
+                return f"Error: {result.error.code} - {result.error.message}"
+            if kind == "abstract" and result.kind == "AbstractiveSummarization":
+                abstract_pieces[owner].append(" ".join([summary.text for summary in result.summaries]))
+            elif kind == "extract" and result.kind == "ExtractiveSummarization":
+                print("Extractive Summary API Raw Response:", result)  # Debugging
+                extract_pieces[owner].append("\n".join([sentence.text for sentence in result.sentences]))
 
+    return [{"abstract": " ".join(abstract), "extract": "\n".join(extract)}
+            for abstract, extract in zip(abstract_pieces, extract_pieces)]
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from features import extract_mfcc, SAMPLE_RATE, N_MFCC, HOP_LENGTH, CLIP_OFFSET, CLIP_DURATION
+
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "cache")
+FEATURE_WORKERS = int(os.getenv("FEATURE_WORKERS", str(os.cpu_count() or 1)))
+# Bump when extract_mfcc changes in a way the parameters below do not capture
+FEATURE_VERSION = 1
+
+
+def feature_params():
+    return {"version": FEATURE_VERSION, "sample_rate": SAMPLE_RATE, "n_mfcc": N_MFCC, "hop_length": HOP_LENGTH,
+            "offset": CLIP_OFFSET, "duration": CLIP_DURATION}
+
+
+def params_key(params=None):
+    raw = json.dumps(params or feature_params(), sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _extract(path):
+    try:
+        return path, extract_mfcc(path).astype(np.float32), None
+    except Exception as e:
+        return path, None, repr(e)
+
+
+class FeatureStore:
+    """Clip MFCC features for many files, persisted as one memory-mapped matrix.
+
+    `<root>/features-<params>.npy` holds one row per file and
+    `<root>/features-<params>.json` maps each absolute path to its
+    (mtime_ns, size) signature and row. A different parameter set gets its own
+    pair of files. `load(paths)` decodes only files that are new or whose
+    signature changed, in a process pool, then rewrites the matrix.
+    """
+
+    def __init__(self, root=FEATURE_STORE_DIR, workers=FEATURE_WORKERS):
+        self.root = root
+        self.workers = max(1, workers)
+        key = params_key()
+        self.matrix_path = os.path.join(root, f"features-{key}.npy")
+        self.index_path = os.path.join(root, f"features-{key}.json")
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            matrix = np.load(self.matrix_path, mmap_mode='r')
+            return index["entries"], matrix
+        except (OSError, ValueError, KeyError):
+            return {}, None
+
+    def _extract_all(self, paths):
+        """{path: features} for `paths` decoded in parallel; failures are reported and skipped."""
+        if not paths:
+            return {}
+        results = {}
+        started = time.perf_counter()
+        if self.workers == 1:
+            outputs = map(_extract, paths)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            outputs = executor.map(_extract, paths, chunksize=max(1, len(paths) // (self.workers * 8)))
+        try:
+            for done, (path, features, error) in enumerate(outputs, 1):
+                if error is not None:
+                    print(f"⚠️ Skipping {path}: {error}")
+                else:
+                    results[path] = features
+                if done % 500 == 0:
+                    print(f"Extracted features for {done}/{len(paths)} files")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        elapsed = time.perf_counter() - started
+        print(f"Extracted {len(results)} files in {elapsed:.1f}s ({len(paths) / max(elapsed, 1e-9):.1f} files/s)")
+        return results
+
+    def load(self, paths):
+        """Features for `paths` as an (n, N_MFCC) float32 array, plus the paths they belong to.
+
+        Files that cannot be decoded are left out, so the second value is the
+        subset of `paths` (in order) that the rows correspond to.
+        """
+        abs_paths = [os.path.abspath(p) for p in paths]
+        entries, matrix = self._load_index()
+        signatures = {}
+        stale = []
+        for path in dict.fromkeys(abs_paths):
+            try:
+                signatures[path] = _file_signature(path)
+            except OSError as e:
+                print(f"⚠️ Skipping {path}: {e}")
+                continue
+            entry = entries.get(path)
+            if matrix is None or entry is None or entry[:2] != signatures[path] or entry[2] >= len(matrix):
+                stale.append(path)
+        print(f"Feature store: {len(signatures) - len(stale)} cached, {len(stale)} to extract")
+
+        fresh = self._extract_all(stale)
+        if fresh or matrix is None:
+            # Rewrite: keep every still-valid row, append the new ones
+            keep = {p: e for p, e in entries.items() if p not in stale and matrix is not None and e[2] < len(matrix)}
+            new_entries = {}
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{self.matrix_path}.tmp.npy"
+            out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                            shape=(len(keep) + len(fresh), N_MFCC))
+            for row, (path, entry) in enumerate(keep.items()):
+                out[row] = matrix[entry[2]]
+                new_entries[path] = [entry[0], entry[1], row]
+            for row, (path, features) in enumerate(fresh.items(), len(keep)):
+                out[row] = features
+                new_entries[path] = signatures[path] + [row]
+            out.flush()
+            del out, matrix
+            os.replace(tmp_path, self.matrix_path)
+            tmp_index = f"{self.index_path}.tmp"
+            with open(tmp_index, 'w', encoding='utf-8') as f:
+                json.dump({"params": feature_params(), "entries": new_entries}, f)
+            os.replace(tmp_index, self.index_path)
+            entries, matrix = new_entries, np.load(self.matrix_path, mmap_mode='r')
+
+        kept = [(p, entries[a][2]) for p, a in zip(paths, abs_paths)
+                if a in signatures and a in entries and entries[a][:2] == signatures[a]]
+        rows = np.array([row for _, row in kept], dtype=np.int64)
+        return matrix[rows], [p for p, _ in kept]
+
+
+def load_features(paths, root=FEATURE_STORE_DIR, workers=FEATURE_WORKERS):
+    return FeatureStore(root, workers).load(paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute clip MFCC features for a directory of audio")
+    parser.add_argument("data_dir")
+    parser.add_argument("--store", default=FEATURE_STORE_DIR)
+    parser.add_argument("--workers", type=int, default=FEATURE_WORKERS)
+    args = parser.parse_args(argv)
+    paths = [os.path.join(dirname, name) for dirname, _, names in os.walk(args.data_dir)
+             for name in names if name.lower().endswith('.wav')]
+    features, kept = load_features(paths, args.store, args.workers)
+    print(f"{len(kept)} feature rows, shape {features.shape}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import librosa
+
+# Feature parameters shared by training, the API and batch tools. The model was
+# trained on the mean of 40 MFCCs over a 3 second clip starting at 0.5 s.
+SAMPLE_RATE = 22050
+N_MFCC = 40
+HOP_LENGTH = 512
+CLIP_OFFSET = 0.5
+CLIP_DURATION = 3.0
+WINDOW_SECONDS = float(os.getenv("EMOTION_WINDOW_SECONDS", "3.0"))
+HOP_SECONDS = float(os.getenv("EMOTION_HOP_SECONDS", "1.5"))
+# Bump when window placement changes; cached window features are keyed on it
+WINDOWS_VERSION = 2
+
+
+def load_audio(filename, sr=SAMPLE_RATE, offset=0.0, duration=None):
+    """Decode an audio file once to mono float32 at `sr`."""
+    y, sr = librosa.load(filename, sr=sr, offset=offset, duration=duration)
+    return y, sr
+
+
+def mfcc_frames(y, sr=SAMPLE_RATE, n_mfcc=N_MFCC, hop_length=HOP_LENGTH):
+    """Frame-level MFCCs for the whole signal, shape (n_frames, n_mfcc)."""
+    return librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc, hop_length=hop_length).T
+
+
+def extract_mfcc(filename):
+    """Single 3 second clip feature, identical to what the model was trained on."""
+    y, sr = load_audio(filename, offset=CLIP_OFFSET, duration=CLIP_DURATION)
+    return np.mean(mfcc_frames(y, sr), axis=0)
+
+
+def extract_mfcc_windows(y, sr=SAMPLE_RATE, window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS,
+                         n_mfcc=N_MFCC, hop_length=HOP_LENGTH):
+    """Mean MFCC vector for every sliding window across the signal.
+
+    The STFT/mel/DCT chain runs once over the whole signal, then every window
+    mean is read off a running sum of the frame matrix, so the cost is one
+    MFCC pass plus O(n_windows) regardless of the window overlap.
+    Returns an (n_windows, n_mfcc) float32 array and the window start times
+    in seconds. When the hop does not land on the end of the signal, a final
+    window aligned to the last frame is added so the tail is scored too.
+    Signals shorter than one window produce a single window.
+    """
+    frames = mfcc_frames(y, sr, n_mfcc=n_mfcc, hop_length=hop_length)
+    n_frames = len(frames)
+    win_frames = min(n_frames, 1 + int(window_seconds * sr) // hop_length)
+    hop_frames = max(1, int(round(hop_seconds * sr / hop_length)))
+    n_windows = 1 + max(0, n_frames - win_frames) // hop_frames
+
+    # Preallocated running sum with a leading zero row: sum(frames[a:b]) == csum[b] - csum[a]
+    csum = np.zeros((n_frames + 1, n_mfcc), dtype=np.float64)
+    np.cumsum(frames, axis=0, out=csum[1:])
+
+    starts = np.arange(n_windows) * hop_frames
+    if starts[-1] + win_frames < n_frames:
+        starts = np.append(starts, n_frames - win_frames)
+    windows = (csum[starts + win_frames] - csum[starts]) / win_frames
+    start_times = starts * hop_length / sr
+    return windows.astype(np.float32), start_times
+
+
+def extract_file_windows(filename, window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS):
+    """Decode `filename` once and return (windows, start_times, duration_seconds)."""
+    y, sr = load_audio(filename)
+    windows, start_times = extract_mfcc_windows(y, sr, window_seconds, hop_seconds)
+    return windows, start_times, len(y) / sr
@@ -0,0 +1,139 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+MEMO_DB_PATH = os.getenv("LLM_MEMO_DB", os.path.join("cache", "llm_memo.sqlite3"))
+MEMO_TTL_SECONDS = float(os.getenv("LLM_MEMO_TTL_SECONDS", str(7 * 24 * 3600)))
+MEMO_MAX_BYTES = int(float(os.getenv("LLM_MEMO_MAX_MB", "256")) * 1024 * 1024)
+
+
+def normalize_text(text):
+    """Unicode-normalised text with runs of whitespace collapsed."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text or '')).strip()
+
+
+def memo_key(kind, version, text):
+    raw = f"{kind}\0{version}\0{normalize_text(text)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class MemoStore:
+    """Persistent memo of LLM / Text Analytics results in SQLite.
+
+    Entries are keyed by a hash of the result kind ("topic", "summary"), the
+    model/prompt version and the normalised input text, so changing a prompt
+    or model naturally misses. Entries older than `ttl` seconds are treated
+    as misses and deleted; when the stored values exceed `max_bytes` the least
+    recently read ones are evicted.
+    """
+
+    def __init__(self, path=MEMO_DB_PATH, ttl=MEMO_TTL_SECONDS, max_bytes=MEMO_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+        self._evictions = 0
+        self._expired = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS memo (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS IX_memo_accessed ON memo (accessed)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM memo").fetchone()[0]
+
+    def _count(self, counters, kind):
+        counters[kind] = counters.get(kind, 0) + 1
+
+    def get(self, kind, version, text):
+        key = memo_key(kind, version, text)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, size, created FROM memo WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl > 0 and now - row[2] > self.ttl:
+                self._conn.execute("DELETE FROM memo WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= row[1]
+                self._expired += 1
+                row = None
+            if row is None:
+                self._count(self._misses, kind)
+                return None
+            self._conn.execute("UPDATE memo SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._count(self._hits, kind)
+        return json.loads(row[0])
+
+    def set(self, kind, version, text, value):
+        key = memo_key(kind, version, text)
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM memo WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO memo (key, kind, value, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, payload, size, now, now))
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Oldest reads first, in chunks, until back under the size limit
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM memo ORDER BY accessed LIMIT 100").fetchall()
+            if len(rows) <= 1:
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM memo WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self._evictions += 1
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM memo").fetchone()[0]
+            hits, misses = dict(self._hits), dict(self._misses)
+            return {
+                "entries": entries,
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "evictions": self._evictions,
+                "expired": self._expired,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": {kind: round(hits.get(kind, 0) / (hits.get(kind, 0) + misses.get(kind, 0)), 3)
+                             for kind in set(hits) | set(misses)},
+            }
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_memo_store():
+    """Process-wide memo store, opened on first use."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = MemoStore()
+    return _default_store
@@ -0,0 +1,163 @@
+import os
+import time
+import threading
+from model_registry import get_model
+from llm_memo import get_memo_store
+from topic_batching import key_sentence_excerpt, split_sentences
+
+# "azure" uses Text Analytics (extact.py); "local" runs a seq2seq model on this machine
+SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "azure")
+LOCAL_SUMMARY_MODEL = os.getenv("LOCAL_SUMMARY_MODEL", "facebook/bart-large-cnn")
+LOCAL_SUMMARY_BATCH_SIZE = int(os.getenv("LOCAL_SUMMARY_BATCH_SIZE", "8"))
+# Dynamic int8 quantization of the Linear layers; CPU only
+LOCAL_SUMMARY_QUANTIZE = os.getenv("LOCAL_SUMMARY_QUANTIZE", "false").lower() == "true"
+LOCAL_SUMMARY_MAX_LENGTH = int(os.getenv("LOCAL_SUMMARY_MAX_LENGTH", "100"))
+LOCAL_SUMMARY_MIN_LENGTH = int(os.getenv("LOCAL_SUMMARY_MIN_LENGTH", "30"))
+LOCAL_SUMMARY_NUM_BEAMS = int(os.getenv("LOCAL_SUMMARY_NUM_BEAMS", "4"))
+# Input tokens per chunk; BART reads at most 1024
+LOCAL_SUMMARY_CHUNK_TOKENS = int(os.getenv("LOCAL_SUMMARY_CHUNK_TOKENS", "900"))
+LOCAL_EXTRACT_TOKENS = int(os.getenv("LOCAL_EXTRACT_TOKENS", "120"))
+
+
+def _load_summarizer(model_name, quantize):
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    if quantize:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        device = torch.device("cpu")
+    else:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model.to(device)
+    return tokenizer, model, device
+
+
+class LocalSummarizer:
+    """Abstractive summaries from a local seq2seq model, many documents per forward pass.
+
+    Texts longer than `chunk_tokens` are summarized map-reduce style: every
+    chunk of every document is summarized in shared batches, then each
+    document's chunk summaries are joined and summarized again until one
+    summary fits a single chunk.
+    """
+
+    def __init__(self, model_name=LOCAL_SUMMARY_MODEL, batch_size=LOCAL_SUMMARY_BATCH_SIZE,
+                 quantize=LOCAL_SUMMARY_QUANTIZE, chunk_tokens=LOCAL_SUMMARY_CHUNK_TOKENS,
+                 max_length=LOCAL_SUMMARY_MAX_LENGTH, min_length=LOCAL_SUMMARY_MIN_LENGTH,
+                 num_beams=LOCAL_SUMMARY_NUM_BEAMS):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.quantize = quantize
+        self.chunk_tokens = chunk_tokens
+        self.max_length = max_length
+        self.min_length = min_length
+        self.num_beams = num_beams
+        self._stats_lock = threading.Lock()
+        self._documents = 0
+        self._forward_passes = 0
+        self._seconds = 0.0
+
+    @property
+    def version(self):
+        return f"local:{self.model_name}:{'int8' if self.quantize else 'fp32'}:{self.chunk_tokens}:{self.max_length}"
+
+    def _components(self):
+        key = f"summarizer:{self.model_name}:{'int8' if self.quantize else 'fp32'}"
+        return get_model(key, lambda: _load_summarizer(self.model_name, self.quantize))
+
+    def _chunk(self, tokenizer, text):
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        if len(ids) <= self.chunk_tokens:
+            return [text]
+        return [tokenizer.decode(ids[i:i + self.chunk_tokens]) for i in range(0, len(ids), self.chunk_tokens)]
+
+    def _generate(self, texts):
+        """One summary per text, batched by similar length to limit padding."""
+        import torch
+        tokenizer, model, device = self._components()
+        order = sorted(range(len(texts)), key=lambda k: len(texts[k]))
+        summaries = [None] * len(texts)
+        for i in range(0, len(order), self.batch_size):
+            batch = order[i:i + self.batch_size]
+            inputs = tokenizer([texts[k] for k in batch], max_length=self.chunk_tokens + 24, truncation=True,
+                               padding=True, return_tensors="pt").to(device)
+            with torch.inference_mode():
+                output = model.generate(**inputs, max_length=self.max_length, min_length=self.min_length,
+                                        num_beams=self.num_beams, do_sample=False, early_stopping=True)
+            for k, summary in zip(batch, tokenizer.batch_decode(output, skip_special_tokens=True)):
+                summaries[k] = summary.strip()
+            with self._stats_lock:
+                self._forward_passes += 1
+        return summaries
+
+    def summarize(self, texts):
+        started = time.perf_counter()
+        tokenizer, _, _ = self._components()
+        current = list(texts)
+        pending = list(range(len(texts)))
+        results = [""] * len(texts)
+        while pending:
+            chunks = {k: self._chunk(tokenizer, current[k]) for k in pending if current[k].strip()}
+            flat = [(k, chunk) for k in chunks for chunk in chunks[k]]
+            summaries = self._generate([chunk for _, chunk in flat])
+            joined = {}
+            for (k, _), summary in zip(flat, summaries):
+                joined.setdefault(k, []).append(summary)
+            pending = []
+            for k, parts in joined.items():
+                if len(chunks[k]) == 1:
+                    results[k] = parts[0]
+                else:
+                    # Reduce step: summarize the concatenated chunk summaries
+                    current[k] = " ".join(parts)
+                    pending.append(k)
+        with self._stats_lock:
+            self._documents += len(texts)
+            self._seconds += time.perf_counter() - started
+        return results
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "quantized": self.quantize,
+                "documents": self._documents,
+                "forward_passes": self._forward_passes,
+                "documents_per_second": round(self._documents / self._seconds, 3) if self._seconds else 0.0,
+            }
+
+
+_summarizer = None
+_summarizer_lock = threading.Lock()
+
+
+def get_local_summarizer():
+    global _summarizer
+    with _summarizer_lock:
+        if _summarizer is None:
+            _summarizer = LocalSummarizer()
+        return _summarizer
+
+
+def generate_local_summary(texts):
+    """Same response shape as extact.generateSummary, computed offline.
+
+    The extract summary is the key sentences of each text rather than a
+    model output, so it costs no forward pass.
+    """
+    if not texts:
+        return {"abstract_summary": "", "extract_summary": ""}
+    summarizer = get_local_summarizer()
+    memo = get_memo_store()
+    abstracts = [memo.get("summary", summarizer.version, text) for text in texts]
+
+    misses = [k for k, abstract in enumerate(abstracts) if abstract is None]
+    if misses:
+        for k, abstract in zip(misses, summarizer.summarize([texts[k] for k in misses])):
+            memo.set("summary", summarizer.version, texts[k], abstract)
+            abstracts[k] = abstract
+
+    extracts = ["\n".join(split_sentences(key_sentence_excerpt(text, LOCAL_EXTRACT_TOKENS))) for text in texts]
+    return {"abstract_summaries": abstracts, "extract_summaries": extracts}
@@ -0,0 +1,118 @@
+import os
+import time
+import threading
+
+# Models unused for this many seconds are dropped; 0 keeps them resident forever
+IDLE_TIMEOUT_SECONDS = float(os.getenv("MODEL_IDLE_TIMEOUT_SECONDS", "0"))
+REAP_INTERVAL_SECONDS = float(os.getenv("MODEL_REAP_INTERVAL_SECONDS", "60"))
+
+
+class ModelRegistry:
+    """Process-wide cache of heavy models, loaded lazily on first use.
+
+    `get(key, loader)` returns the shared instance for `key`, calling
+    `loader()` only once even under concurrent first use. With an idle timeout
+    a background thread drops models nobody asked for recently; callers still
+    holding a reference keep it alive until they finish. Models fetched with
+    `pin=True` are never dropped as idle.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT_SECONDS, reap_interval=REAP_INTERVAL_SECONDS):
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._models = {}
+        self._last_used = {}
+        self._load_seconds = {}
+        self._pinned = set()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key, loader, pin=False):
+        with self._lock:
+            if key in self._models:
+                self._last_used[key] = time.monotonic()
+                if pin:
+                    self._pinned.add(key)
+                return self._models[key]
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._models:
+                    self._last_used[key] = time.monotonic()
+                    if pin:
+                        self._pinned.add(key)
+                    return self._models[key]
+            print(f"Loading model: {key}")
+            started = time.perf_counter()
+            model = loader()
+            with self._lock:
+                self._models[key] = model
+                self._last_used[key] = time.monotonic()
+                self._load_seconds[key] = time.perf_counter() - started
+                if pin:
+                    self._pinned.add(key)
+            self._ensure_reaper()
+            return model
+
+    def unload(self, key):
+        with self._lock:
+            self._last_used.pop(key, None)
+            self._pinned.discard(key)
+            return self._models.pop(key, None) is not None
+
+    def unload_idle(self, idle_timeout=None):
+        idle_timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, last in self._last_used.items()
+                    if now - last >= idle_timeout and key not in self._pinned]
+            for key in idle:
+                self._models.pop(key, None)
+                self._last_used.pop(key, None)
+        for key in idle:
+            print(f"Unloaded idle model: {key}")
+        return idle
+
+    def _ensure_reaper(self):
+        if self.idle_timeout <= 0 or (self._reaper is not None and self._reaper.is_alive()):
+            return
+        with self._lock:
+            if self._reaper is None or not self._reaper.is_alive():
+                self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+                self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(min(self.reap_interval, self.idle_timeout))
+            self.unload_idle()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    "idle_seconds": round(now - self._last_used[key], 1),
+                    "load_seconds": round(self._load_seconds.get(key, 0.0), 2),
+                    "pinned": key in self._pinned,
+                }
+                for key in self._models
+            }
+
+
+registry = ModelRegistry()
+
+
+def get_model(key, loader, pin=False):
+    return registry.get(key, loader, pin)
+
+
+def get_whisper_model(name):
+    """Shared Whisper model of the given size ("base", "medium", ...)."""
+    def load():
+        import whisper
+        return whisper.load_model(name)
+    return registry.get(f"whisper:{name}", load)
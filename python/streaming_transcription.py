@@ -0,0 +1,100 @@
+import os
+import subprocess
+import numpy as np
+from audio import process_audio_file, TRANSCRIPTION_ERROR, TRANSLATION_ERROR
+
+SAMPLE_RATE = 16000  # what Whisper expects
+# Chunks never exceed one Whisper window, so memory is bounded by this, not the file length
+MAX_CHUNK_SECONDS = float(os.getenv("STREAM_MAX_CHUNK_SECONDS", "30"))
+# The cut is placed at the quietest point within this many seconds before the limit
+SILENCE_SEARCH_SECONDS = float(os.getenv("STREAM_SILENCE_SEARCH_SECONDS", "5"))
+ENERGY_FRAME_SECONDS = 0.03
+READ_BLOCK_SECONDS = 1.0
+
+
+def _quietest_cut(buffer, search_from):
+    """Sample index of the lowest-energy frame in buffer[search_from:]."""
+    frame = int(ENERGY_FRAME_SECONDS * SAMPLE_RATE)
+    region = buffer[search_from:]
+    n_frames = len(region) // frame
+    if n_frames < 1:
+        return len(buffer)
+    energy = np.square(region[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    return search_from + int(np.argmin(energy)) * frame + frame // 2
+
+
+def iter_audio_chunks(file_path, max_chunk_seconds=MAX_CHUNK_SECONDS, search_seconds=SILENCE_SEARCH_SECONDS):
+    """Decode `file_path` incrementally and yield (start_seconds, waveform) chunks.
+
+    ffmpeg streams 16 kHz mono PCM through a pipe; whenever the buffer reaches
+    `max_chunk_seconds` it is cut at the quietest frame in the last
+    `search_seconds`, so chunk boundaries fall in pauses rather than mid-word.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", file_path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    max_samples = int(max_chunk_seconds * SAMPLE_RATE)
+    search_samples = min(int(search_seconds * SAMPLE_RATE), max_samples // 2)
+    block_bytes = int(READ_BLOCK_SECONDS * SAMPLE_RATE) * 2
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    buffer = np.zeros(0, dtype=np.float32)
+    consumed = 0  # samples already yielded
+    leftover = b""  # odd trailing byte of a short pipe read
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if data:
+                data = leftover + data
+                usable = len(data) - len(data) % 2
+                leftover = data[usable:]
+                block = np.frombuffer(data[:usable], np.int16).astype(np.float32) / 32768.0
+                buffer = np.concatenate([buffer, block])
+            while len(buffer) >= max_samples:
+                cut = _quietest_cut(buffer[:max_samples], max_samples - search_samples)
+                yield consumed / SAMPLE_RATE, buffer[:cut]
+                consumed += cut
+                buffer = buffer[cut:]
+            if not data:
+                break
+        if process.wait() != 0 and consumed == 0 and len(buffer) == 0:
+            raise RuntimeError(f"Failed to decode audio: {file_path}")
+        if len(buffer):
+            yield consumed / SAMPLE_RATE, buffer
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def transcribe_streaming(file_path, **kwargs):
+    """Yield ("partial", chunk_result) per chunk, then ("final", merged_result).
+
+    The language detected on the first chunk is reused for the rest of the file.
+    """
+    transcripts = []
+    translations = []
+    language = None
+    failed = False
+    for index, (start, chunk) in enumerate(iter_audio_chunks(file_path, **kwargs)):
+        result = process_audio_file(chunk, language=language)
+        language = language or result.get("language")
+        failed = failed or TRANSCRIPTION_ERROR == result["transcription"] or TRANSLATION_ERROR == result["translation"]
+        transcripts.append(result["transcription"].strip())
+        translations.append(result["translation"].strip())
+        yield "partial", {
+            "chunk": index,
+            "start": round(start, 3),
+            "end": round(start + len(chunk) / SAMPLE_RATE, 3),
+            "transcription": result["transcription"],
+            "translation": result["translation"],
+        }
+    yield "final", {
+        "transcription": " ".join(t for t in transcripts if t),
+        "translation": " ".join(t for t in translations if t),
+        "language": language,
+        "chunks": len(transcripts),
+        "failed": failed,
+    }
@@ -0,0 +1,40 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch_predict import score  # noqa: E402
+
+pq = pytest.importorskip("pyarrow.parquet")
+sf = pytest.importorskip("soundfile")
+
+
+class FixedModel:
+    def predict_on_batch(self, x):
+        return np.tile(np.array([[0.8, 0.2]], dtype=np.float32), (len(x), 1))
+
+
+@pytest.mark.parametrize("names", [("a_ok.wav", "b_bad.wav"), ("a_bad.wav", "b_ok.wav")])
+def test_parquet_mixes_ok_and_failed_batches(tmp_path, names):
+    audio_dir = tmp_path / "audio"
+    audio_dir.mkdir()
+    for name in names:
+        if "ok" in name:
+            t = np.arange(22050 * 4) / 22050
+            sf.write(audio_dir / name, 0.1 * np.sin(2 * np.pi * 220 * t), 22050)
+        else:
+            (audio_dir / name).write_bytes(b"not audio")
+    output = str(tmp_path / "scores.parquet")
+
+    # One file per batch, so the OK and failed rows arrive as separate Parquet writes
+    scored, failed = score(str(audio_dir), output, FixedModel(), ["calm", "angry"], workers=1,
+                           batch_size=1, files_per_task=1)
+
+    assert (scored, failed) == (1, 1)
+    rows = {os.path.basename(row["path"]): row for row in pq.read_table(output).to_pylist()}
+    ok = next(name for name in names if "ok" in name)
+    bad = next(name for name in names if "bad" in name)
+    assert rows[ok]["emotion"] == "calm" and rows[ok]["error"] is None
+    assert rows[ok]["p_calm"] == pytest.approx(0.8)
+    assert rows[bad]["emotion"] is None and rows[bad]["error"]
@@ -0,0 +1,102 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+
+TOKENIZER_ENCODING = os.getenv("TOPIC_TOKENIZER_ENCODING", "o200k_base")  # gpt-4o
+# Input tokens of document text packed into one request
+BATCH_TOKEN_BUDGET = int(os.getenv("TOPIC_BATCH_TOKEN_BUDGET", "12000"))
+# Longer transcripts are reduced to key sentences that fit this many tokens
+DOC_TOKEN_LIMIT = int(os.getenv("TOPIC_DOC_TOKEN_LIMIT", "400"))
+# Caps documents per request so the JSON answer stays well inside the output limit
+MAX_DOCS_PER_BATCH = int(os.getenv("TOPIC_MAX_DOCS_PER_BATCH", "40"))
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?。！？؟])\s+|\n+')
+WORD = re.compile(r'\w+', re.UNICODE)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """tiktoken encoding, or None when it cannot be loaded (e.g. offline without a cached BPE file)."""
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                print(f"⚠️ tiktoken encoding {TOKENIZER_ENCODING} unavailable ({e}), estimating token counts")
+                _encoding = False
+        return _encoding or None
+
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text.encode('utf-8')) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_SPLIT.split(text) if s and s.strip()]
+
+
+def key_sentence_excerpt(text, max_tokens=DOC_TOKEN_LIMIT):
+    """Representative excerpt of `text` within `max_tokens`.
+
+    Sentences are scored by the average document frequency of their words
+    (words of three letters or fewer are ignored), the best ones are kept
+    until the budget is full and the result is returned in original order.
+    The opening sentence is always considered first since calls usually
+    state their purpose early.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    sentences = split_sentences(text)
+    if len(sentences) <= 1:
+        return _truncate_tokens(text, max_tokens)
+
+    sentence_words = [[w.lower() for w in WORD.findall(s) if len(w) > 3] for s in sentences]
+    frequencies = Counter(w for words in sentence_words for w in words)
+    scores = [sum(frequencies[w] for w in words) / (len(words) + 1) for words in sentence_words]
+    order = [0] + sorted(range(1, len(sentences)), key=lambda k: scores[k], reverse=True)
+
+    chosen, used = [], 0
+    for k in order:
+        tokens = count_tokens(sentences[k]) + 1
+        if used + tokens > max_tokens:
+            continue
+        chosen.append(k)
+        used += tokens
+    if not chosen:
+        return _truncate_tokens(sentences[order[0]], max_tokens)
+    return " ".join(sentences[k] for k in sorted(chosen))
+
+
+def _truncate_tokens(text, max_tokens):
+    encoding = get_encoding()
+    if encoding is None:
+        return text.encode('utf-8')[:max_tokens * 4].decode('utf-8', errors='ignore')
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def pack_batches(texts, token_budget=BATCH_TOKEN_BUDGET, max_docs=MAX_DOCS_PER_BATCH):
+    """Group consecutive texts into batches of at most `token_budget` tokens.
+
+    Returns lists of indices into `texts`. A text larger than the budget on
+    its own still gets a batch of one.
+    """
+    batches, current, used = [], [], 0
+    for index, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (used + tokens > token_budget or len(current) >= max_docs):
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import random
+import hashlib
+import asyncio
+import threading
+from openai import AsyncAzureOpenAI
+import background_loop
+from topic_batching import key_sentence_excerpt, pack_batches, BATCH_TOKEN_BUDGET, DOC_TOKEN_LIMIT
+
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "https://calcenteropenai.openai.azure.com/")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-05-01-preview")
+TOPIC_MODEL = os.getenv("TOPIC_MODEL", "gpt-4o")
+TOPIC_CONCURRENCY = int(os.getenv("TOPIC_CONCURRENCY", "8"))
+TOPIC_REQUESTS_PER_MINUTE = float(os.getenv("TOPIC_REQUESTS_PER_MINUTE", "120"))
+TOPIC_MAX_RETRIES = int(os.getenv("TOPIC_MAX_RETRIES", "3"))
+
+TOPIC_SYSTEM_PROMPT = (
+    "You are an expert in multilingual topic modeling and text analysis. You receive a JSON object with a "
+    "\"textDocuments\" array. Analyze each text in its original language and identify its main topic, keeping "
+    "the language of the input text. "
+    "Respond with a JSON object of the form {\"topics\": [{\"topic\": \"Topic Name\", \"description\": \"Brief "
+    "description of the topic\"}]} containing exactly one entry per input text, in the same order."
+)
+# Identifies the prompt/model/excerpting configuration, e.g. for memoized results
+TOPIC_PROMPT_VERSION = hashlib.sha256(
+    f"{TOPIC_MODEL}\0{TOPIC_SYSTEM_PROMPT}\0{DOC_TOKEN_LIMIT}".encode('utf-8')).hexdigest()[:16]
+
+
+class RateLimiter:
+    """Spaces request starts so at most `per_minute` begin in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class TopicEngine:
+    """Runs topic-modeling batches concurrently through one chat-completions client.
+
+    Each batch is a single chat-completions call with JSON output, so there is
+    no assistant thread, run or polling. At most `concurrency` batches are in
+    flight and request starts are limited to `requests_per_minute`.
+    """
+
+    def __init__(self, client=None, model=TOPIC_MODEL, concurrency=TOPIC_CONCURRENCY,
+                 requests_per_minute=TOPIC_REQUESTS_PER_MINUTE, max_retries=TOPIC_MAX_RETRIES):
+        self._client = client
+        self.model = model
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self._semaphore = None
+        self._rate_limiter = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = AsyncAzureOpenAI(
+                azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                api_key=os.getenv('API_KEY'),
+                api_version=AZURE_OPENAI_API_VERSION
+            )
+        return self._client
+
+    def _limits(self):
+        # Created lazily so they bind to the loop the engine actually runs on
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._rate_limiter = RateLimiter(self.requests_per_minute)
+        return self._semaphore, self._rate_limiter
+
+    async def model_batch(self, texts):
+        """Topic dicts for `texts`, one per text in order."""
+        semaphore, rate_limiter = self._limits()
+        async with semaphore:
+            for attempt in range(self.max_retries):
+                try:
+                    await rate_limiter.wait()
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": TOPIC_SYSTEM_PROMPT},
+                            {"role": "user", "content": json.dumps({"textDocuments": texts}, ensure_ascii=False)},
+                        ],
+                        response_format={"type": "json_object"},
+                        temperature=1,
+                        top_p=1
+                    )
+                    topics = json.loads(response.choices[0].message.content).get("topics", [])
+                    # A split or merged entry would shift every later topic onto the wrong text
+                    if len(topics) != len(texts):
+                        raise ValueError(f"Expected {len(texts)} topics, got {len(topics)}")
+                    return topics
+                except Exception as e:
+                    print(f"❌ Topic batch error on attempt {attempt + 1}: {str(e)}")
+                    if attempt + 1 < self.max_retries:
+                        await asyncio.sleep(random.uniform(0, 2 ** attempt))
+            return None
+
+    async def model_texts(self, transcriptions, token_budget=BATCH_TOKEN_BUDGET, doc_token_limit=DOC_TOKEN_LIMIT):
+        """{"topic", "description"} per transcription in order, None where its batch failed."""
+        def prepare():
+            texts = [key_sentence_excerpt(text, doc_token_limit) for text in transcriptions]
+            return texts, pack_batches(texts, token_budget)
+
+        # Tokenizing is CPU work; keep it off the shared event loop
+        texts, batches = await asyncio.to_thread(prepare)
+
+        batch_topics = await asyncio.gather(*(self.model_batch([texts[k] for k in batch]) for batch in batches))
+
+        topics = [None] * len(transcriptions)
+        for batch, topics_data in zip(batches, batch_topics):
+            if topics_data is None:
+                continue  # batch failed after all retries
+            for k, topic in zip(batch, topics_data):
+                topics[k] = {"topic": topic.get("topic", "Unknown"), "description": topic.get("description", "")}
+        return topics
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_topic_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TopicEngine()
+        return _engine
+
+
+def model_topics(transcriptions):
+    """Blocking entry point for Flask routes; reuses the engine's client across requests."""
+    return background_loop.run(get_topic_engine().model_texts(transcriptions))
@@ -1,393 +1,183 @@
-import pandas as pd
-import numpy as np
 import os
-import seaborn as sns
-import matplotlib.pyplot as plt
-import librosa
-import librosa.display
-from IPython.display import Audio
-import warnings
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import time
 import pickle
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+from feature_store import load_features, FEATURE_STORE_DIR, FEATURE_WORKERS
 warnings.filterwarnings('ignore')
 
-app = Flask(__name__)
-CORS(app)
-
-# Ensure openpyxl is installed
-try:
-    import openpyxl
-except ModuleNotFoundError:
-    print("Please install openpyxl by running 'pip install openpyxl'")
-    raise
-
-"""## Load the Dataset"""
-
-# Check if the directory exists
-# directory = 'E:\AudioFile\OAF'
-directory= 'F:/AI_Project/speech_audio/AudioFile/AudioFile/OAF'
-
-if not os.path.exists(directory):
-    print(f"The directory {directory} does not exist.")
-# else:
-    # print(f"The directory {directory} exists.")
-
-    # Check if the directory contains any files or subdirectories
-    items = os.listdir(directory)
-    if not items:
-        print(f"The directory {directory} is empty.")
-    # else:
-    #     print(f"The directory {directory} contains {len(items)} items.")
-
-# Proceed with the original script with more debug statements
-paths = []
-labels = []
-
-for dirname, _, filenames in os.walk(directory):
-    # print(f'Entering directory: {dirname}')
-    for filename in filenames:
-        # print(f'Found file: {filename}')
-        paths.append(os.path.join(dirname, filename))
-        label = filename.split('_')[-1]
-        label = label.split('.')[0]
-        labels.append(label.lower())
-        if len(paths) == 2800:
+# Defaults for the TESS-style corpus: <speaker>_<word>_<emotion>.wav
+DATA_DIR = os.getenv("TRAIN_DATA_DIR", 'F:/AI_Project/speech_audio/AudioFile/AudioFile/OAF')
+MAX_FILES = 2800
+# Artifact names app.py and predict_only.py load
+MODEL_FILENAME = 'emotion_recognition_model.h5'
+ENCODER_FILENAME = 'label_encoder.pkl'
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.m4a')
+
+
+def list_dataset(directory, max_files=MAX_FILES):
+    """DataFrame of audio paths and the emotion label taken from each filename."""
+    if not os.path.exists(directory):
+        raise FileNotFoundError(f"The directory {directory} does not exist.")
+    paths = []
+    labels = []
+    for dirname, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            paths.append(os.path.join(dirname, filename))
+            label = filename.split('_')[-1]
+            label = label.split('.')[0]
+            labels.append(label.lower())
+            if max_files and len(paths) == max_files:
+                break
+        if max_files and len(paths) == max_files:
             break
-    if len(paths) == 2800:
-        break
-
-# print(f'Dataset is Loaded. Number of paths: {len(paths)}')
-# print('Sample paths:', paths[:5])
-# print('Sample labels:', labels[:5])
-
-len(paths)
-
-paths[:5]
-
-labels[:5]
-
-## Create a dataframe
-df = pd.DataFrame()
-df['speech'] = paths
-df['label'] = labels
-df.head()
-
-df['label'].value_counts()
-print(df['label'].value_counts())
-
-
-"""## Exploratory Data Analysis"""
-
-#sns.countplot(df['label'])
-
-#!pip install --upgrade librosa
-
-def waveplot(data, sr, emotion):
-    plt.figure(figsize=(10,4))
-    plt.title(emotion, size=20)
-    librosa.display.waveshow(data, sr=sr)
-    # plt.show()
-
-def spectogram(data, sr, emotion):
-    x = librosa.stft(data)
-    xdb = librosa.amplitude_to_db(abs(x))
-    plt.figure(figsize=(11,4))
-    plt.title(emotion, size=20)
-    librosa.display.specshow(xdb, sr=sr, x_axis='time', y_axis='hz')
-    plt.colorbar()
-
-emotion = 'fear'
-path = np.array(df['speech'][df['label']==emotion])[0]
-data, sampling_rate = librosa.load(path)
-waveplot(data, sampling_rate, emotion)
-spectogram(data, sampling_rate, emotion)
-Audio(path)
-
-emotion = 'angry'
-path = np.array(df['speech'][df['label']==emotion])[1]
-data, sampling_rate = librosa.load(path)
-waveplot(data, sampling_rate, emotion)
-spectogram(data, sampling_rate, emotion)
-Audio(path)
-
-emotion = 'disgust'
-path = np.array(df['speech'][df['label']==emotion])[0]
-data, sampling_rate = librosa.load(path)
-waveplot(data, sampling_rate, emotion)
-spectogram(data, sampling_rate, emotion)
-Audio(path)
-
-emotion = 'neutral'
-path = np.array(df['speech'][df['label']==emotion])[0]
-data, sampling_rate = librosa.load(path)
-waveplot(data, sampling_rate, emotion)
-spectogram(data, sampling_rate, emotion)
-Audio(path)
-
-emotion = 'sad'
-path = np.array(df['speech'][df['label']==emotion])[0]
-data, sampling_rate = librosa.load(path)
-waveplot(data, sampling_rate, emotion)
-spectogram(data, sampling_rate, emotion)
-Audio(path)
-
-emotion = 'ps'
-path = np.array(df['speech'][df['label']==emotion])[0]
-data, sampling_rate = librosa.load(path)
-waveplot(data, sampling_rate, emotion)
-spectogram(data, sampling_rate, emotion)
-Audio(path)
-
-emotion = 'happy'
-path = np.array(df['speech'][df['label']==emotion])[0]
-data, sampling_rate = librosa.load(path)
-waveplot(data, sampling_rate, emotion)
-spectogram(data, sampling_rate, emotion)
-Audio(path)
-
-"""## Feature Extraction"""
-
-
-def extract_mfcc(filename):
-    y, sr = librosa.load(filename, duration=3, offset=0.5)
-    mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40).T, axis=0)
-    return mfcc
-
-extract_mfcc(df['speech'][0])
-
-X_mfcc = df['speech'].apply(lambda x: extract_mfcc(x))
-
-X_mfcc
-
-X = [x for x in X_mfcc]
-X = np.array(X)
-X.shape
-
-## input split
-X = np.expand_dims(X, -1)
-X.shape
-
-from sklearn.preprocessing import OneHotEncoder
-enc = OneHotEncoder()
-y = enc.fit_transform(df[['label']])
-
-y = y.toarray()
-
-y.shape
-
-with open('label_encoder', 'wb') as f:
-    pickle.dump(enc, f)
-
-"""## Create the LSTM Model"""
-
-#!pip install --upgrade keras tensorflow
-
-from keras.models import Sequential # type: ignore
-from keras.layers import Dense, LSTM, Dropout
-
-# model = Sequential([
-#     LSTM(256, return_sequences=False, input_shape=(40,1)),
-#     Dropout(0.2),
-#     Dense(128, activation='relu'),
-#     Dropout(0.2),
-#     Dense(64, activation='relu'),
-#     Dropout(0.2),
-#     Dense(8, activation='softmax')  # Adjust to match the number of classes
-# ])
-model = Sequential([
-    LSTM(256, return_sequences=False, input_shape=(40,1)),
-    Dropout(0.2),
-    Dense(128, activation='relu'),
-    Dropout(0.2),
-    Dense(64, activation='relu'),
-    Dropout(0.2),
-    Dense(8, activation='softmax')  # Adjust to match the number of classes
-])
-
-
-
-model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
-model.summary()
-
-# Train the model
-history = model.fit(X, y, validation_split=0.2, epochs=50, batch_size=64)
-
-# best val accuracy: 72.32
-# use checkpoint to save the best val accuracy model
-# adjust learning rate for slow convergence
-
-# Save the trained model to a file
-model.save('emotion_recognition_model')
-
-"""## Plot the results"""
-
-epochs = list(range(50))
-acc = history.history['accuracy']
-val_acc = history.history['val_accuracy']
-
-loss = history.history['loss']
-val_loss = history.history['val_loss']
-
-
-
-# Predict on new data
-def predict_emotion(filename):
-    mfcc = extract_mfcc(filename)
-    mfcc = np.expand_dims(mfcc, axis=0)  # Add batch dimension
-    mfcc = np.expand_dims(mfcc, -1)      # Add channel dimension
-    prediction = model.predict(mfcc)
-    predicted_label = np.argmax(prediction, axis=1)
-    emotion_dict = enc.categories_[0]
-    predicted_emotion = emotion_dict[predicted_label[0]]
-    return predicted_emotion
-
-import os
-import pandas as pd
-
-# Function to get all file paths from the specified directory and its subdirectories
-def get_audio_files(directory):
-    audio_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.wav'):  # You can add other audio file extensions if needed
-                audio_files.append(os.path.join(root, file))
-    return audio_files
-
-# Specify the directory containing the audio files
-# directory = r'C:\Users\madhu\OneDrive\Desktop\pythoncode\AudioFile\YAF'
-directory='F:/AI_Project/speech_audio/AudioFile/AudioFile/YAF'
-
-# Get all audio files from the directory and its subdirectories
-audio_files = get_audio_files(directory)
-
-# Create a list to store the results
-results = []
-
-# Predict emotion for each audio file
-with open('predicted_emotions.txt', 'w') as f:
-    for file_path in audio_files:
-        print(f"Attempting to access file: {file_path}")
-        predicted_emotion = predict_emotion(file_path)
-        print(f"Predicted emotion for {file_path}: {predicted_emotion}")
-        results.append((file_path, predicted_emotion))
-        result = f"Predicted emotion for {file_path}: {predicted_emotion}\n"
-        print(result)
-        f.write(result)
-
-# Convert the results to a DataFrame
-df = pd.DataFrame(results, columns=['File Path', 'Predicted Emotion'])
-
-# Save the DataFrame to an Excel file
-df.to_excel('predicted_emotions.xlsx', index=False)
-
-
-
-
-
-
-
-
-# import pandas as pd
-# import numpy as np
-# import os
-# import seaborn as sns
-# import matplotlib.pyplot as plt
-# import librosa
-# import librosa.display
-# from IPython.display import Audio
-# import warnings
-# warnings.filterwarnings('ignore')
-
-# # Ensure openpyxl is installed
-# try:
-#     import openpyxl
-# except ModuleNotFoundError:
-#     print("Please install openpyxl by running 'pip install openpyxl'")
-#     raise
-
-# # Load the Dataset
-# directory = 'E:\AudioFile\OAF'
-# if not os.path.exists(directory):
-#     print(f"The directory {directory} does not exist.")
-
-# items = os.listdir(directory)
-# if not items:
-#     print(f"The directory {directory} is empty.")
-
-# # Proceed with the original script with more debug statements
-# paths = []
-# labels = []
-
-# for dirname, _, filenames in os.walk(directory):
-#     for filename in filenames:
-#         paths.append(os.path.join(dirname, filename))
-#         label = filename.split('_')[-1]
-#         label = label.split('.')[0]
-#         labels.append(label.lower())
-#         if len(paths) == 2800:
-#             break
-#     if len(paths) == 2800:
-#         break
-
-# df = pd.DataFrame()
-# df['speech'] = paths
-# df['label'] = labels
-
-# # Exploratory Data Analysis
-# def waveplot(data, sr, emotion):
-#     plt.figure(figsize=(10,4))
-#     plt.title(emotion, size=20)
-#     librosa.display.waveshow(data, sr=sr)
-
-# def spectogram(data, sr, emotion):
-#     x = librosa.stft(data)
-#     xdb = librosa.amplitude_to_db(abs(x))
-#     plt.figure(figsize=(11,4))
-#     plt.title(emotion, size=20)
-#     librosa.display.specshow(xdb, sr=sr, x_axis='time', y_axis='hz')
-#     plt.colorbar()
-
-# # Feature Extraction
-# def extract_mfcc(filename):
-#     y, sr = librosa.load(filename, duration=3, offset=0.5)
-#     mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40).T, axis=0)
-#     return mfcc
-
-# X_mfcc = df['speech'].apply(lambda x: extract_mfcc(x))
-# X = [x for x in X_mfcc]
-# X = np.array(X)
-# X = np.expand_dims(X, -1)
-
-# from sklearn.preprocessing import OneHotEncoder
-# enc = OneHotEncoder()
-# y = enc.fit_transform(df[['label']])
-# y = y.toarray()
-
-# # Create the LSTM Model
-# from keras.models import Sequential
-# from keras.layers import Dense, LSTM, Dropout
-
-# model = Sequential([
-#     LSTM(256, return_sequences=False, input_shape=(40,1)),
-#     Dropout(0.2),
-#     Dense(128, activation='relu'),
-#     Dropout(0.2),
-#     Dense(64, activation='relu'),
-#     Dropout(0.2),
-#     Dense(7, activation='softmax')
-# ])
-
-# model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
-# model.summary()
-
-# # Train the model
-# history = model.fit(X, y, validation_split=0.2, epochs=50, batch_size=64)
-
-# # Save the model
-# model.save('emotion_recognition_model.h5')
-
-# # Save the encoder
-# import pickle
-# with open('label_encoder.pkl', 'wb') as file:
-#     pickle.dump(enc, file)
+    if not paths:
+        raise ValueError(f"The directory {directory} contains no audio files.")
+    return pd.DataFrame({'speech': paths, 'label': labels})
+
+
+def build_model(n_classes):
+    from keras.models import Sequential  # type: ignore
+    from keras.layers import Dense, LSTM, Dropout, Input
+    model = Sequential([
+        Input(shape=(40, 1)),
+        LSTM(256, return_sequences=False),
+        Dropout(0.2),
+        Dense(128, activation='relu'),
+        Dropout(0.2),
+        Dense(64, activation='relu'),
+        Dropout(0.2),
+        Dense(n_classes, activation='softmax')
+    ])
+    model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
+    return model
+
+
+def make_datasets(X, y, batch_size, validation_split=0.2, seed=42):
+    """Shuffled train/validation tf.data pipelines, cached in memory and prefetched."""
+    import tensorflow as tf
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_val = int(len(X) * validation_split)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+
+    def pipeline(idx, shuffle):
+        ds = tf.data.Dataset.from_tensor_slices((X[idx], y[idx])).cache()
+        if shuffle:
+            ds = ds.shuffle(len(idx), seed=seed, reshuffle_each_iteration=True)
+        return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    return pipeline(train_idx, True), (pipeline(val_idx, False) if n_val else None), len(train_idx)
+
+
+def _throughput_callback(n_samples):
+    import keras
+
+    class EpochThroughput(keras.callbacks.Callback):
+        """Adds wall time and samples/second to every epoch's logs."""
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self._started = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            elapsed = time.perf_counter() - self._started
+            if logs is not None:
+                logs['epoch_seconds'] = elapsed
+                logs['samples_per_second'] = n_samples / elapsed
+            print(f"Epoch {epoch + 1}: {elapsed:.2f}s, {n_samples / elapsed:.0f} samples/s")
+
+    return EpochThroughput()
+
+
+def _publish_artifacts(model, enc, model_path, encoder_path):
+    """Write the model and encoder under temp names, then swap both in.
+
+    Nothing in the serving directory changes until both files are complete,
+    so a failed or interrupted run never pairs a new encoder with an old model.
+    """
+    model_tmp = f"{os.path.splitext(model_path)[0]}.tmp.h5"
+    encoder_tmp = f"{encoder_path}.tmp"
+    try:
+        model.save(model_tmp)
+        with open(encoder_tmp, 'wb') as f:
+            pickle.dump(enc, f)
+        os.replace(model_tmp, model_path)
+        os.replace(encoder_tmp, encoder_path)
+    finally:
+        for path in (model_tmp, encoder_tmp):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def train(data_dir=DATA_DIR, output_dir='.', epochs=50, batch_size=64, patience=8, validation_split=0.2,
+          max_files=MAX_FILES, feature_store_dir=FEATURE_STORE_DIR, workers=FEATURE_WORKERS):
+    """Train the emotion model and write the model and label encoder into `output_dir`.
+
+    Keeps the checkpoint with the best validation accuracy (or training
+    accuracy when there is no validation split) and returns the Keras history.
+    """
+    import keras
+    from sklearn.preprocessing import OneHotEncoder
+    started = time.perf_counter()
+
+    df = list_dataset(data_dir, max_files)
+    print(df['label'].value_counts())
+
+    # Decoded in parallel and cached by path/mtime; re-runs only extract new or changed files
+    X, kept_paths = load_features(list(df['speech']), feature_store_dir, workers)
+    df = df[df['speech'].isin(kept_paths)].reset_index(drop=True)
+    X = np.expand_dims(np.asarray(X, dtype=np.float32), -1)
+    print(f"Features ready in {time.perf_counter() - started:.1f}s: {X.shape}")
+
+    enc = OneHotEncoder()
+    y = enc.fit_transform(df[['label']]).toarray().astype(np.float32)
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, MODEL_FILENAME)
+    encoder_path = os.path.join(output_dir, ENCODER_FILENAME)
+    weights_path = os.path.join(output_dir, 'emotion_recognition_model.best.weights.h5')
+
+    train_ds, val_ds, n_train = make_datasets(X, y, batch_size, validation_split)
+    model = build_model(len(enc.categories_[0]))
+    model.summary()
+
+    monitor = 'val_accuracy' if val_ds is not None else 'accuracy'
+    callbacks = [
+        _throughput_callback(n_train),
+        keras.callbacks.EarlyStopping(monitor=monitor, mode='max', patience=patience, restore_best_weights=True),
+        keras.callbacks.ModelCheckpoint(weights_path, monitor=monitor, mode='max', save_best_only=True,
+                                        save_weights_only=True),
+    ]
+    history = model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=callbacks, verbose=2)
+
+    # Keras 3 checkpoints full models only as .keras; app.py loads the .h5, so save it from the best weights
+    model.load_weights(weights_path)
+    _publish_artifacts(model, enc, model_path, encoder_path)
+
+    best = max(history.history.get(monitor, [0.0]))
+    print(f"Best {monitor}: {best:.4f}; saved {model_path} and {encoder_path}")
+    print(f"Total training wall time: {time.perf_counter() - started:.1f}s")
+    return history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the speech emotion recognition model")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory of <...>_<emotion>.wav files")
+    parser.add_argument("--output-dir", default=".", help="Where emotion_recognition_model.h5 and label_encoder.pkl go")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--patience", type=int, default=8, help="Epochs without improvement before stopping")
+    parser.add_argument("--validation-split", type=float, default=0.2)
+    parser.add_argument("--max-files", type=int, default=MAX_FILES, help="0 for no limit")
+    parser.add_argument("--feature-store", default=FEATURE_STORE_DIR)
+    parser.add_argument("--workers", type=int, default=FEATURE_WORKERS, help="Feature extraction processes")
+    args = parser.parse_args(argv)
+    train(args.data_dir, args.output_dir, args.epochs, args.batch_size, args.patience, args.validation_split,
+          args.max_files, args.feature_store, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+# Worker processes each keep their own Whisper models resident (see model_registry)
+WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "2"))
+THREADS_PER_WORKER = int(os.getenv("TRANSCRIBE_THREADS_PER_WORKER", str(max(1, (os.cpu_count() or 1) // max(1, WORKERS)))))
+# Files submitted but not yet finished; bounds memory held by decoded audio and results
+MAX_IN_FLIGHT = int(os.getenv("TRANSCRIBE_MAX_IN_FLIGHT", str(WORKERS * 2)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(threads):
+    # Split the cores between workers instead of every worker using all of them
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _transcribe_file(file_path):
+    from audio import process_audio_file
+    return process_audio_file(file_path)
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(THREADS_PER_WORKER,),
+            )
+        return _pool
+
+
+def _reset_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
+
+
+def transcribe_completed(jobs, max_in_flight=MAX_IN_FLIGHT):
+    """Transcribe `jobs` in the worker pool and yield results as they finish.
+
+    `jobs` is an iterable of (key, file_path); it is consumed lazily so at most
+    `max_in_flight` files are queued in the pool at once. Yields
+    (key, file_path, result, error) in completion order, with exactly one of
+    result/error set.
+    """
+    jobs = iter(jobs)
+    in_flight = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(in_flight) < max(1, max_in_flight):
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                key, file_path = job
+                pool = get_pool()
+                in_flight[pool.submit(_transcribe_file, file_path)] = (key, file_path, pool)
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, file_path, pool = in_flight.pop(future)
+                try:
+                    result, error = future.result(), None
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. out of memory); later submissions get a fresh pool
+                    _reset_pool(pool)
+                    result, error = None, e
+                except Exception as e:
+                    result, error = None, e
+                yield key, file_path, result, error
+    finally:
+        # The client went away: drop whatever has not started yet
+        for future in in_flight:
+            future.cancel()
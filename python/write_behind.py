@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from collections import deque
+import numpy as np
+from db_operations import insert_deepgram_results_batch
+
+WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "200"))
+WRITE_FLUSH_INTERVAL_SECONDS = float(os.getenv("DB_WRITE_FLUSH_INTERVAL_SECONDS", "1.0"))
+SPOOL_RETRY_SECONDS = float(os.getenv("DB_SPOOL_RETRY_SECONDS", "30"))
+SPOOL_PATH = os.getenv("DB_SPOOL_PATH", os.path.join("spool", "deepgram_writes.jsonl"))
+DEAD_LETTER_PATH = os.getenv("DB_DEAD_LETTER_PATH", os.path.join("spool", "deepgram_dead_letter.jsonl"))
+STATS_WINDOW = 1000
+
+
+def is_connection_error(exc):
+    """True when `exc` means the database is unreachable rather than the rows are bad.
+
+    DB-API drivers (pyodbc, sqlite3) raise OperationalError/InterfaceError for
+    lost connections, timeouts and locks; data, integrity and programming
+    errors fail the same way on every retry.
+    """
+    return isinstance(exc, OSError) or type(exc).__name__ in ("OperationalError", "InterfaceError")
+
+
+class WriteBehindQueue:
+    """Accepts rows immediately and writes them to the database in the background.
+
+    A single worker thread collects submitted items into batches of up to
+    `batch_size` (waiting at most `flush_interval` seconds) and hands each
+    batch to `flush_fn`. If the database is unreachable (`is_transient`) the
+    batch is appended to a JSONL spool file and fsynced; the spool is replayed
+    when the worker starts and every `retry_interval` seconds until the
+    database accepts it again. While the database is known to be down, new
+    batches go straight to the spool. Any other error is treated as bad data:
+    the batch is split in halves until the rejected items are isolated, and
+    those go to the dead-letter file so the rest keeps flowing.
+    Items must be JSON serialisable.
+    """
+
+    def __init__(self, flush_fn, spool_path=SPOOL_PATH, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval=WRITE_FLUSH_INTERVAL_SECONDS, retry_interval=SPOOL_RETRY_SECONDS,
+                 dead_letter_path=DEAD_LETTER_PATH, is_transient=is_connection_error):
+        self.flush_fn = flush_fn
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path
+        self.is_transient = is_transient
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._db_down_until = 0.0
+        self._flush_latencies = deque(maxlen=STATS_WINDOW)
+        self._counters = {
+            "submitted": 0,
+            "flushed": 0,
+            "batches": 0,
+            "flush_failures": 0,
+            "spooled": 0,
+            "replayed": 0,
+            "dead_lettered": 0,
+        }
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        self.start()
+        self._queue.put(item)
+        self._count("submitted")
+
+    def stop(self, timeout=10.0):
+        """Flush what is queued, spooling anything the database does not take."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return
+        leftover = self._drain(self._queue.qsize(), wait=0)
+        if leftover:
+            self._spool(leftover)
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._counters[name] += n
+
+    def _drain(self, limit, wait):
+        items = []
+        deadline = time.monotonic() + wait
+        while len(items) < limit:
+            remaining = deadline - time.monotonic() if items else wait
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        self._replay_spool()
+        next_retry = time.monotonic() + self.retry_interval
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._drain(self.batch_size, self.flush_interval)
+            if batch:
+                self._write(batch)
+            if time.monotonic() >= next_retry:
+                self._replay_spool()
+                next_retry = time.monotonic() + self.retry_interval
+
+    def _flush(self, batch):
+        """Write `batch`; returns the trailing items left unwritten because the database is down."""
+        started = time.perf_counter()
+        try:
+            self.flush_fn(batch)
+        except Exception as e:
+            self._count("flush_failures")
+            if self.is_transient(e):
+                print(f"❌ Database flush of {len(batch)} rows failed: {e}")
+                self._db_down_until = time.monotonic() + self.retry_interval
+                return batch
+            if len(batch) == 1:
+                print(f"❌ Database rejected a row, moved to {self.dead_letter_path}: {e!r}")
+                self._dead_letter(batch[0], e)
+                return []
+            # Bisect to isolate the bad rows; the halves that load still go in
+            middle = len(batch) // 2
+            left = self._flush(batch[:middle])
+            if left:
+                return left + batch[middle:]
+            return self._flush(batch[middle:])
+        with self._stats_lock:
+            self._flush_latencies.append(time.perf_counter() - started)
+            self._counters["batches"] += 1
+            self._counters["flushed"] += len(batch)
+        self._db_down_until = 0.0
+        return []
+
+    def _write(self, batch):
+        if time.monotonic() < self._db_down_until:
+            self._spool(batch)
+            return
+        left = self._flush(batch)
+        if left:
+            self._spool(left)
+
+    @staticmethod
+    def _append_lines(path, lines):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _spool(self, batch):
+        self._append_lines(self.spool_path, [json.dumps(item) for item in batch])
+        self._count("spooled", len(batch))
+
+    def _dead_letter(self, item, error):
+        record = {"item": item, "error": repr(error), "failed_at": time.time()}
+        self._append_lines(self.dead_letter_path, [json.dumps(record)])
+        self._count("dead_lettered")
+
+    def _replay_spool(self):
+        if not os.path.exists(self.spool_path):
+            return
+        with open(self.spool_path, 'r', encoding='utf-8') as f:
+            while True:
+                batch = []
+                for line in iter(f.readline, ''):
+                    try:
+                        batch.append(json.loads(line))
+                    except ValueError:
+                        continue  # torn write from a crash
+                    if len(batch) >= self.batch_size:
+                        break
+                if not batch:
+                    break
+                left = self._flush(batch)
+                self._count("replayed", len(batch) - len(left))
+                if left:
+                    # Keep the unflushed tail for the next attempt
+                    remaining = f.read()
+                    tmp_path = f"{self.spool_path}.tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as out:
+                        out.write("".join(json.dumps(item) + "\n" for item in left))
+                        out.write(remaining)
+                        out.flush()
+                        os.fsync(out.fileno())
+                    os.replace(tmp_path, self.spool_path)
+                    return
+        os.remove(self.spool_path)
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = np.array(self._flush_latencies, dtype=np.float64) * 1000
+            counters = dict(self._counters)
+        spool_bytes = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+        dead_letter_bytes = os.path.getsize(self.dead_letter_path) if os.path.exists(self.dead_letter_path) else 0
+        return {
+            "queue_depth": self._queue.qsize(),
+            **counters,
+            "spool_bytes": spool_bytes,
+            "dead_letter_bytes": dead_letter_bytes,
+            "database_down": time.monotonic() < self._db_down_until,
+            "flush_latency_ms": {
+                "mean": round(float(latencies.mean()), 3) if len(latencies) else 0.0,
+                "p99": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else 0.0,
+                "last": round(float(latencies[-1]), 3) if len(latencies) else 0.0,
+            },
+        }
+
+
+def _flush_deepgram_rows(items):
+    insert_deepgram_results_batch([(item["results"], item["filename"]) for item in items])
+
+
+deepgram_write_queue = WriteBehindQueue(_flush_deepgram_rows)
+atexit.register(deepgram_write_queue.stop)